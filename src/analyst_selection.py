@@ -0,0 +1,104 @@
+import logging
+import math
+from collections import Counter
+from context_budget import cosine, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def persona_text(analyst):
+    return f"{analyst.role}\n{analyst.description}"
+
+
+def tfidf_vectors(texts):
+    """
+    Sparse TF-IDF vectors of ``texts``, with IDF taken over the texts themselves
+    """
+
+    counts = [Counter(tokenize(text)) for text in texts]
+    df = Counter(term for terms in counts for term in terms)
+    n = len(texts)
+    return [{term: tf * math.log(1 + n / df[term]) for term, tf in terms.items()} for terms in counts]
+
+
+def sparse_cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(weight * b.get(term, 0.0) for term, weight in a.items())
+    norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+    return dot / norm if norm else 0.0
+
+
+def mmr(relevance, similarity, k, diversity=0.5, max_similarity=None):
+    """
+    Indexes of up to ``k`` items picked by maximal marginal relevance
+
+    Each pick maximizes ``(1 - diversity) * relevance - diversity * similarity
+    to the closest item already picked``; ties go to the earlier item. Items
+    at least ``max_similarity`` similar to a picked one are never picked.
+    """
+
+    remaining = list(range(len(relevance)))
+    picked = []
+    while remaining and len(picked) < k:
+        def score(i):
+            redundancy = max((similarity[i][j] for j in picked), default=0.0)
+            return (1 - diversity) * relevance[i] - diversity * redundancy
+
+        best = max(remaining, key=lambda i: (score(i), -i))
+        picked.append(best)
+        remaining.remove(best)
+        if max_similarity is not None:
+            remaining = [i for i in remaining if similarity[i][best] < max_similarity]
+    return picked
+
+
+class AnalystSelector:
+    """
+    Picks a diverse set of analysts from an over-generated pool.
+
+    ``create_analysts`` asks for ``oversample`` times as many personas as
+    analysts wanted, and ``select`` keeps the ones that best balance
+    relevance to the topic against similarity to personas already kept
+    (MMR). Personas are compared by role and description, with TF-IDF
+    vectors or, given ``embeddings`` (a LangChain Embeddings instance), by
+    embedding cosine. A persona at least ``duplicate_threshold`` similar to
+    a kept one is a duplicate and never interviewed, so a pool with few
+    distinct personas yields fewer interviews. The default threshold suits
+    TF-IDF; embedding similarities run higher, so raise it with embeddings.
+    """
+
+    def __init__(self, oversample=2.0, diversity=0.6, duplicate_threshold=0.6, embeddings=None):
+        self.oversample = oversample
+        self.diversity = diversity
+        self.duplicate_threshold = duplicate_threshold
+        self.__embeddings = embeddings
+
+    def candidates(self, max_analysts):
+        return max(max_analysts, math.ceil(max_analysts * self.oversample))
+
+    def __scores(self, topic, texts):
+        if self.__embeddings is not None:
+            vectors = self.__embeddings.embed_documents(texts)
+            query = self.__embeddings.embed_query(topic)
+            measure = cosine
+        else:
+            *vectors, query = tfidf_vectors(texts + [topic])
+            measure = sparse_cosine
+        relevance = [measure(query, vector) for vector in vectors]
+        similarity = [[measure(a, b) for b in vectors] for a in vectors]
+        return relevance, similarity
+
+    def select(self, topic, analysts, max_analysts):
+        """
+        Up to ``max_analysts`` distinct analysts, in the order they were picked
+        """
+
+        analysts = list(analysts)
+        if len(analysts) <= 1:
+            return analysts
+        relevance, similarity = self.__scores(topic, [persona_text(analyst) for analyst in analysts])
+        picked = mmr(relevance, similarity, max_analysts, self.diversity, self.duplicate_threshold)
+        if len(picked) < min(max_analysts, len(analysts)):
+            logger.info("Kept %d of %d analysts, the others duplicate them", len(picked), len(analysts))
+        return [analysts[i] for i in picked]
@@ -0,0 +1,31 @@
+class InteractiveApproval:
+    """
+    Ask on the terminal whether the generated analysts are good enough
+    """
+
+    def review(self, topic, analysts):
+        user_approval = input("Are you satisfied with generated analysts (yes/no): ")
+        if user_approval.lower() == "yes":
+            return None
+        return input("How would you improve analyst creation: ")
+
+
+class AutoApprove:
+    """
+    Accept the generated analysts as they are
+    """
+
+    def review(self, topic, analysts):
+        return None
+
+
+class FeedbackApproval:
+    """
+    Regenerate the analysts once with feedback supplied up front
+    """
+
+    def __init__(self, feedback):
+        self.feedback = feedback
+
+    def review(self, topic, analysts):
+        return self.feedback or None
@@ -0,0 +1,114 @@
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from approval import AutoApprove, FeedbackApproval
+
+
+def read_topics(path):
+    """
+    Read topics from a file, one per line
+
+    A line may also be a JSON object with a ``topic`` and optional
+    ``feedback``, ``max_analysts`` and ``thread_id``. Blank lines and lines
+    starting with # are skipped.
+    """
+
+    topics = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                topics.append(json.loads(line))
+            else:
+                topics.append({"topic": line})
+    return topics
+
+
+def run_topic(storm, job, max_analysts, approval):
+    thread_id = job.get("thread_id") or str(uuid.uuid4())
+    if job.get("feedback"):
+        approval = FeedbackApproval(job["feedback"])
+
+    result = {"topic": job["topic"], "thread_id": thread_id}
+    started = time.perf_counter()
+    try:
+        result["report"] = storm.invoke(
+            job["topic"],
+            max_analysts=job.get("max_analysts", max_analysts),
+            thread_id=thread_id,
+            approval=approval,
+        )
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed"] = time.perf_counter() - started
+    result["profile"] = storm.get_profile(thread_id)
+    return result
+
+
+def run_batch(topics, storm=None, max_analysts=3, approval=None, concurrency=4, output=None):
+    """
+    Research many topics in parallel, yielding each result as it finishes
+
+    ``topics`` are strings or dicts as returned by ``read_topics``. All topics
+    share one compiled StormGraph, each in its own thread. When ``output`` is a
+    writable file, every result is also written to it as a JSONL line.
+    """
+
+    if storm is None:
+        from storm_langchain import StormGraph
+        storm = StormGraph()
+    approval = approval if approval is not None else AutoApprove()
+    jobs = [{"topic": topic} if isinstance(topic, str) else topic for topic in topics]
+    write_lock = threading.Lock()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_topic, storm, job, max_analysts, approval) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            if output is not None:
+                with write_lock:
+                    output.write(json.dumps(result) + "\n")
+                    output.flush()
+            yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write STORM reports for a file of topics.")
+    parser.add_argument("topics", help="file with one topic (or JSON object) per line")
+    parser.add_argument("-o", "--output", help="JSONL file for the reports, defaults to stdout")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="topics researched at once")
+    parser.add_argument("--max-analysts", type=int, default=3)
+    parser.add_argument("--feedback", help="analyst feedback applied to every topic instead of auto-approval")
+    parser.add_argument("--models", help="JSON model registry mapping pipeline steps to models")
+    args = parser.parse_args(argv)
+
+    storm = None
+    if args.models:
+        from model_registry import ModelRegistry
+        from storm_langchain import StormGraph
+        storm = StormGraph(models=ModelRegistry.from_json(args.models))
+
+    approval = FeedbackApproval(args.feedback) if args.feedback else AutoApprove()
+    output = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    failures = 0
+    try:
+        for result in run_batch(read_topics(args.topics), storm=storm, max_analysts=args.max_analysts,
+                                approval=approval, concurrency=args.concurrency, output=output):
+            failures += result["status"] != "ok"
+            print(f"[{result['status']}] {result['topic']} ({result['elapsed']:.1f}s)", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
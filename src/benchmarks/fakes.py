@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+import typing
+from collections import defaultdict
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, convert_to_messages
+from langchain_core.runnables.config import ensure_config
+from pydantic import BaseModel
+from context_budget import count_tokens
+
+VOCABULARY = (
+    "cluster instance latency throughput replica shard cache index query token budget region subnet "
+    "gateway policy role bucket snapshot volume kernel thread process queue stream batch vector "
+    "embedding schema partition failover backup metric alarm dashboard pipeline deployment rollout"
+).split()
+
+
+def seeded_random(*parts):
+    digest = hashlib.sha256("\x00".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def fake_words(rng, count):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(count))
+
+
+def current_node():
+    return ensure_config().get("metadata", {}).get("langgraph_node", "unknown")
+
+
+class CallRecorder:
+    """
+    Per-node call counts and token volumes seen by the fakes
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__nodes = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+
+    def record(self, node, prompt_tokens=0, completion_tokens=0):
+        with self.__lock:
+            stats = self.__nodes[node]
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+
+    def as_dict(self):
+        with self.__lock:
+            return {node: dict(stats) for node, stats in self.__nodes.items()}
+
+
+class PrefixCache:
+    """
+    Simulates provider-side prompt caching: prompts of at least ``min_tokens``
+    reuse the longest previously seen prefix, in ``block_tokens`` increments
+    """
+
+    def __init__(self, min_tokens=1024, block_tokens=128):
+        self.__min_chars = min_tokens * 4
+        self.__block_chars = block_tokens * 4
+        self.__seen = set()
+        self.__lock = threading.Lock()
+
+    def cached_tokens(self, prompt):
+        if len(prompt) < self.__min_chars:
+            return 0
+        blocks = range(self.__block_chars, len(prompt) + 1, self.__block_chars)
+        with self.__lock:
+            cached = 0
+            for end in blocks:
+                if hashlib.sha1(prompt[:end].encode("utf-8")).hexdigest() not in self.__seen:
+                    break
+                cached = end
+            self.__seen.update(hashlib.sha1(prompt[:end].encode("utf-8")).hexdigest() for end in blocks)
+        return cached // 4 if cached >= self.__min_chars else 0
+
+
+class FakeChatModel:
+    """
+    Deterministic stand-in for ChatOpenAI
+
+    Responses are derived from a hash of the prompt, so identical prompts get
+    identical answers. ``latency`` seconds are spent per call and plain
+    responses are ``response_words`` long and cite the first document ids
+    found in the prompt. Plain responses report usage, with cached prompt
+    tokens from a simulated provider prefix cache. Structured output is filled in
+    from the schema's fields; Perspectives honours the requested number of
+    analysts.
+    """
+
+    def __init__(self, latency=0.0, response_words=300, recorder=None, seed=0):
+        self.latency = latency
+        self.response_words = response_words
+        self.recorder = recorder if recorder is not None else CallRecorder()
+        self.seed = seed
+        self.temperature = 0
+        self.prefix_cache = PrefixCache()
+
+    @property
+    def _identifying_params(self):
+        return {"model": "fake", "response_words": self.response_words, "seed": self.seed}
+
+    def __prompt(self, messages):
+        messages = convert_to_messages(messages)
+        return messages, "\n".join(str(message.content) for message in messages)
+
+    def __respond(self, messages):
+        messages, prompt = self.__prompt(messages)
+        rng = seeded_random(self.seed, prompt)
+        cited = list(dict.fromkeys(re.findall(r'id="([0-9a-f]{8})"', prompt) + re.findall(r"\[([0-9a-f]{8})\]", prompt)))
+        citations = " ".join(f"[{id}]" for id in cited[:3])
+        content = f"## {fake_words(rng, 4).title()}\n\n{fake_words(rng, self.response_words)} {citations}"
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+        self.recorder.record(current_node(), prompt_tokens, completion_tokens)
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "input_token_details": {"cache_read": min(prompt_tokens, self.prefix_cache.cached_tokens(prompt))},
+        })
+
+    def invoke(self, messages, *args, **kwargs):
+        time.sleep(self.latency)
+        return self.__respond(messages)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self.__respond(messages)
+
+    def with_structured_output(self, schema, **kwargs):
+        return FakeStructuredModel(self, schema)
+
+    def structured(self, schema, messages):
+        messages, prompt = self.__prompt(messages)
+        rng = seeded_random(self.seed, schema.__name__, prompt)
+        count = 3
+        match = re.search(r"top (\d+) themes", prompt)
+        if match:
+            count = int(match.group(1))
+        result = fake_instance(schema, rng, count)
+        self.recorder.record(current_node(), count_tokens(prompt), count_tokens(result.model_dump_json()))
+        return result
+
+
+class FakeStructuredModel:
+    def __init__(self, llm, schema):
+        self.__llm = llm
+        self.__schema = schema
+
+    def invoke(self, messages, *args, **kwargs):
+        time.sleep(self.__llm.latency)
+        return self.__llm.structured(self.__schema, messages)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.__llm.latency)
+        return self.__llm.structured(self.__schema, messages)
+
+
+def fake_value(annotation, rng, count):
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+        origin = typing.get_origin(annotation)
+    if origin in (list, typing.List):
+        (item,) = typing.get_args(annotation) or (str,)
+        return [fake_value(item, rng, count) for _ in range(count)]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return fake_instance(annotation, rng, count)
+    if annotation is int:
+        return rng.randrange(100)
+    if annotation is float:
+        return rng.random()
+    if annotation is bool:
+        return False
+    return fake_words(rng, 12)
+
+
+def fake_instance(schema, rng, count=3):
+    return schema(**{
+        name: fake_value(field.annotation, rng, count)
+        for name, field in schema.model_fields.items()
+    })
+
+
+class FakeWebSearch:
+    """
+    Stand-in for TavilySearchResults returning ``max_results`` documents of ``doc_words`` words
+    """
+
+    def __init__(self, latency=0.0, doc_words=200, max_results=3, recorder=None):
+        self.latency = latency
+        self.doc_words = doc_words
+        self.max_results = max_results
+        self.recorder = recorder if recorder is not None else CallRecorder()
+
+    def __results(self, query):
+        rng = seeded_random("web", query)
+        self.recorder.record(current_node())
+        return [
+            {"url": f"https://example.com/{rng.randrange(10**6)}", "content": fake_words(rng, self.doc_words)}
+            for _ in range(self.max_results)
+        ]
+
+    def invoke(self, query, *args, **kwargs):
+        time.sleep(self.latency)
+        return self.__results(query)
+
+    async def ainvoke(self, query, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self.__results(query)
+
+
+class FakeWikipedia:
+    """
+    Loader factory standing in for WikipediaLoader, pages have ``doc_words`` words
+    """
+
+    def __init__(self, latency=0.0, doc_words=2000, recorder=None):
+        self.latency = latency
+        self.doc_words = doc_words
+        self.recorder = recorder if recorder is not None else CallRecorder()
+
+    def __call__(self, query, load_max_docs=2):
+        return FakeWikipediaLoader(self, query, load_max_docs)
+
+    def documents(self, query, load_max_docs):
+        rng = seeded_random("wikipedia", query)
+        self.recorder.record(current_node())
+        documents = []
+        for _ in range(load_max_docs):
+            title = fake_words(rng, 2).title()
+            paragraphs = [fake_words(rng, 80) for _ in range(max(1, self.doc_words // 80))]
+            documents.append(Document(
+                page_content="\n\n".join(paragraphs),
+                metadata={"title": title, "source": f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"},
+            ))
+        return documents
+
+
+class FakeWikipediaLoader:
+    def __init__(self, wikipedia, query, load_max_docs):
+        self.__wikipedia = wikipedia
+        self.__query = query
+        self.__load_max_docs = load_max_docs
+
+    def load(self):
+        time.sleep(self.__wikipedia.latency)
+        return self.__wikipedia.documents(self.__query, self.__load_max_docs)
+
+    async def aload(self):
+        await asyncio.sleep(self.__wikipedia.latency)
+        return self.__wikipedia.documents(self.__query, self.__load_max_docs)
@@ -0,0 +1,67 @@
+import argparse
+import time
+from local_index import ChunkIndex, np
+from benchmarks.fakes import fake_words, seeded_random
+
+
+def fake_documents(count, paragraphs=8, words=150):
+    documents = []
+    for i in range(count):
+        rng = seeded_random("index", i)
+        documents.append({
+            "id": f"{i:08x}",
+            "source": f"https://example.com/{i}",
+            "content": "\n\n".join(fake_words(rng, words) for _ in range(paragraphs)),
+        })
+    return documents
+
+
+def measure(num_documents, queries=200, k=12):
+    """
+    Build a ChunkIndex over fake documents and time its searches
+    """
+
+    documents = fake_documents(num_documents)
+    index = ChunkIndex()
+    started = time.perf_counter()
+    index.add(documents)
+    build = time.perf_counter() - started
+
+    rng = seeded_random("queries", num_documents)
+    query_texts = [fake_words(rng, 8) for _ in range(queries)]
+    started = time.perf_counter()
+    for query in query_texts:
+        index.search(query, k=k)
+    search = (time.perf_counter() - started) / queries
+
+    subset = [doc["id"] for doc in documents[: max(1, num_documents // 5)]]
+    started = time.perf_counter()
+    for query in query_texts:
+        index.search(query, k=k, doc_ids=subset)
+    filtered = (time.perf_counter() - started) / queries
+
+    return {
+        "documents": num_documents,
+        "chunks": len(index),
+        "build_s": build,
+        "search_ms": search * 1000,
+        "filtered_search_ms": filtered * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time local index searches as the corpus grows.")
+    parser.add_argument("--documents", default="50,200,1000", help="comma separated corpus sizes")
+    args = parser.parse_args(argv)
+
+    print(f"numpy: {'yes' if np is not None else 'no'}")
+    for count in [int(value) for value in args.documents.split(",") if value]:
+        result = measure(count)
+        print(
+            f"documents={result['documents']:<6} chunks={result['chunks']:<6} build={result['build_s']:.2f}s "
+            f"search={result['search_ms']:.3f}ms filtered={result['filtered_search_ms']:.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from langchain_core.callbacks import BaseCallbackHandler
+from cache import TieredCache
+from checkpointing import CheckpointPruner
+from retrieval_cache import RetrievalCache
+from storm_langchain import INTRO_CONCLUSION_MODES, StormGraph
+from benchmarks.fakes import CallRecorder, FakeChatModel, FakeWebSearch, FakeWikipedia
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class NodeTimer(BaseCallbackHandler):
+    """
+    Wall-clock time per graph node, summed over all executions of the node
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__started = {}
+        self.__nodes = defaultdict(lambda: {"runs": 0, "wall_clock_s": 0.0})
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node is None or kwargs.get("name") != node:
+            return
+        with self.__lock:
+            parent = self.__started.get(parent_run_id)
+            if parent is None or parent[0] != node:
+                self.__started[run_id] = (node, time.perf_counter())
+
+    def __finish(self, run_id):
+        with self.__lock:
+            started = self.__started.pop(run_id, None)
+            if started is not None:
+                node, start = started
+                self.__nodes[node]["runs"] += 1
+                self.__nodes[node]["wall_clock_s"] += time.perf_counter() - start
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self.__finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.__finish(run_id)
+
+    def as_dict(self):
+        with self.__lock:
+            return {node: dict(stats) for node, stats in self.__nodes.items()}
+
+
+class TimedApproval:
+    """
+    Approves the analysts after ``seconds``, standing in for a person reviewing them
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.approved_at = None
+
+    def review(self, topic, analysts):
+        time.sleep(self.seconds)
+        self.approved_at = time.perf_counter()
+        return None
+
+
+def merge_node_stats(*tables):
+    nodes = defaultdict(dict)
+    for table in tables:
+        for node, stats in table.items():
+            nodes[node].update(stats)
+    return dict(sorted(nodes.items()))
+
+
+def checkpoint_bytes(path):
+    """
+    Serialized size of every checkpoint and pending write in a SqliteSaver database
+    """
+
+    with sqlite3.connect(path) as conn:
+        checkpoints = conn.execute("SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints").fetchone()[0]
+        writes = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes").fetchone()[0]
+    return checkpoints + writes
+
+
+def execute(max_analysts, max_num_turns, llm_latency, search_latency, response_words, web_doc_words, wiki_doc_words,
+            use_async, review_seconds, storm_options, checkpoint_path, trace_memory=False):
+    """
+    One offline run with fresh caches, returning the graph, its measurements and the report
+
+    With ``trace_memory`` the run is traced with tracemalloc, which slows it
+    down several times, so timings are only taken from untraced runs.
+    """
+
+    recorder = CallRecorder()
+    timer = NodeTimer()
+    thread_id = str(uuid.uuid4())
+    storm = StormGraph(
+        llm_cache=TieredCache(),
+        retrieval_cache=RetrievalCache(),
+        max_num_turns=max_num_turns,
+        chat_model=FakeChatModel(latency=llm_latency, response_words=response_words, recorder=recorder),
+        web_search=FakeWebSearch(latency=search_latency, doc_words=web_doc_words, recorder=recorder),
+        wikipedia_loader=FakeWikipedia(latency=search_latency, doc_words=wiki_doc_words, recorder=recorder),
+        checkpoint_path=checkpoint_path,
+        checkpoint_pruner=CheckpointPruner(keep_last=None, max_threads=None),
+        **(storm_options or {}),
+    )
+
+    approval = TimedApproval(review_seconds)
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    if use_async:
+        report = asyncio.run(storm.ainvoke("offline benchmark topic", max_analysts=max_analysts, approval=approval, thread_id=thread_id, callbacks=[timer]))
+    else:
+        report = storm.invoke("offline benchmark topic", max_analysts=max_analysts, approval=approval, thread_id=thread_id, callbacks=[timer])
+    finished = time.perf_counter()
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "storm": storm,
+        "thread_id": thread_id,
+        "report": report,
+        "wall_clock_s": finished - started,
+        "after_approval_s": finished - approval.approved_at,
+        "peak": peak,
+        "nodes": merge_node_stats(timer.as_dict(), recorder.as_dict()),
+    }
+
+
+def run_scenario(max_analysts, max_num_turns, llm_latency=0.0, search_latency=0.0, response_words=300,
+                 web_doc_words=200, wiki_doc_words=2000, use_async=False, review_seconds=0.0, storm_options=None,
+                 measure_memory=True):
+    """
+    Run one STORM report offline and measure it
+
+    Every scenario gets fresh in-memory caches so results are comparable.
+    Checkpoints go to a scratch SQLite file and are kept, so their size
+    covers every step of the run. Peak memory comes from a second, traced
+    run, so tracing does not distort the timings.
+    """
+
+    options = (max_analysts, max_num_turns, llm_latency, search_latency, response_words, web_doc_words, wiki_doc_words,
+               use_async, review_seconds, storm_options)
+    with tempfile.TemporaryDirectory() as scratch:
+        checkpoint_path = os.path.join(scratch, "checkpoints.sqlite")
+        run = execute(*options, checkpoint_path)
+        stored = checkpoint_bytes(checkpoint_path)
+    peak = None
+    if measure_memory:
+        with tempfile.TemporaryDirectory() as scratch:
+            peak = execute(*options, os.path.join(scratch, "checkpoints.sqlite"), trace_memory=True)["peak"]
+
+    storm, nodes = run["storm"], run["nodes"]
+    return {
+        "max_analysts": max_analysts,
+        "max_num_turns": max_num_turns,
+        "async": use_async,
+        "llm_latency_s": llm_latency,
+        "search_latency_s": search_latency,
+        "wall_clock_s": run["wall_clock_s"],
+        "review_s": review_seconds,
+        "after_approval_s": run["after_approval_s"],
+        "peak_memory_mb": peak / 2**20 if peak is not None else None,
+        "peak_memory_per_analyst_mb": peak / 2**20 / max_analysts if peak is not None else None,
+        "checkpoint_bytes": stored,
+        "checkpoint_bytes_per_analyst": stored / max_analysts,
+        "prompt_tokens": sum(stats.get("prompt_tokens", 0) for stats in nodes.values()),
+        "completion_tokens": sum(stats.get("completion_tokens", 0) for stats in nodes.values()),
+        "report_chars": len(run["report"] or ""),
+        "nodes": nodes,
+        "cache": storm.cache_stats(),
+        "context": storm.context_stats(),
+        "profile": storm.get_profile(run["thread_id"]),
+    }
+
+
+def run_suite(analyst_counts, turn_counts, **options):
+    return [
+        run_scenario(max_analysts, max_num_turns, **options)
+        for max_analysts, max_num_turns in itertools.product(analyst_counts, turn_counts)
+    ]
+
+
+def save_results(scenarios, output=None, settings=None):
+    """
+    Write the scenarios to JSON, by default under benchmarks/results/ with a timestamped name
+    """
+
+    created_at = datetime.now(timezone.utc)
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"benchmark-{created_at:%Y%m%dT%H%M%SZ}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": created_at.isoformat(),
+            "python": platform.python_version(),
+            "settings": settings or {},
+            "scenarios": scenarios,
+        }, f, indent=2)
+    return output
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the STORM graphs offline with deterministic fakes.")
+    parser.add_argument("--analysts", type=int_list, default=[1, 2, 4], help="comma separated max_analysts values")
+    parser.add_argument("--turns", type=int_list, default=[1, 2], help="comma separated max_num_turns values")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds per LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="simulated seconds per retrieval")
+    parser.add_argument("--response-words", type=int, default=300)
+    parser.add_argument("--web-doc-words", type=int, default=200)
+    parser.add_argument("--wiki-doc-words", type=int, default=2000)
+    parser.add_argument("--async", dest="use_async", action="store_true", help="benchmark the ainvoke path")
+    parser.add_argument("--intro-conclusion", choices=INTRO_CONCLUSION_MODES, default="parallel",
+                        help="how the introduction and conclusion are written")
+    parser.add_argument("--review-seconds", type=float, default=0.0, help="simulated time a person spends reviewing the analysts")
+    parser.add_argument("--speculative", action="store_true", help="prefetch the first interview turns during the review")
+    parser.add_argument("--no-memory", dest="measure_memory", action="store_false",
+                        help="skip the traced run that measures peak memory")
+    parser.add_argument("-o", "--output", help="JSON file for the results")
+    args = parser.parse_args(argv)
+
+    settings = {
+        "llm_latency": args.llm_latency,
+        "search_latency": args.search_latency,
+        "response_words": args.response_words,
+        "web_doc_words": args.web_doc_words,
+        "wiki_doc_words": args.wiki_doc_words,
+        "use_async": args.use_async,
+        "review_seconds": args.review_seconds,
+        "measure_memory": args.measure_memory,
+        "storm_options": {"intro_conclusion": args.intro_conclusion, "speculative": args.speculative},
+    }
+    scenarios = run_suite(args.analysts, args.turns, **settings)
+
+    for scenario in scenarios:
+        print(
+            f"analysts={scenario['max_analysts']:<3} turns={scenario['max_num_turns']:<3} "
+            f"wall={scenario['wall_clock_s']:.3f}s after_approval={scenario['after_approval_s']:.3f}s prompt_tokens={scenario['prompt_tokens']:<8} "
+            f"cached={scenario['profile']['total']['cached_ratio']:.0%} "
+            f"peak={'-' if scenario['peak_memory_mb'] is None else format(scenario['peak_memory_mb'], '.1f')}MB "
+            f"checkpoints={scenario['checkpoint_bytes_per_analyst'] / 1024:.0f}KB/analyst"
+        )
+    print(f"Saved {save_results(scenarios, args.output, settings)}")
+
+
+if __name__ == "__main__":
+    main()
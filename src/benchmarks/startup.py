@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("openai", "langchain_openai", "langchain_community")
+
+# Runs in a fresh interpreter, so every measurement starts cold.
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import storm_langchain
+imported = time.perf_counter()
+from approval import AutoApprove
+from cache import TieredCache
+from retrieval_cache import RetrievalCache
+from benchmarks.fakes import FakeChatModel, FakeWebSearch, FakeWikipedia
+loaded = [name for name in {heavy!r} if name in sys.modules]
+fakes = time.perf_counter()
+storm = storm_langchain.StormGraph(
+    llm_cache=TieredCache(), retrieval_cache=RetrievalCache(), max_num_turns=1,
+    chat_model=FakeChatModel(), web_search=FakeWebSearch(), wikipedia_loader=FakeWikipedia(),
+)
+constructed = time.perf_counter()
+storm.invoke("startup benchmark topic", max_analysts=1, approval=AutoApprove())
+first = time.perf_counter()
+storm.invoke("startup benchmark topic", max_analysts=1, approval=AutoApprove())
+second = time.perf_counter()
+print(json.dumps({{
+    "import_s": imported - started,
+    "construct_s": constructed - fakes,
+    "first_run_s": first - constructed,
+    "warm_run_s": second - first,
+    "heavy_modules": loaded,
+}}))
+"""
+
+
+def probe():
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(repeat=5):
+    """
+    Median cold import, construction, first run and warm run over ``repeat`` fresh interpreters
+    """
+
+    probes = [probe() for _ in range(repeat)]
+    return {
+        **{key: statistics.median(p[key] for p in probes) for key in ("import_s", "construct_s", "first_run_s", "warm_run_s")},
+        "heavy_modules": probes[-1]["heavy_modules"],
+        "repeat": repeat,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time cold start of the STORM graph in fresh interpreters.")
+    parser.add_argument("--repeat", type=int, default=5, help="number of fresh interpreters to measure")
+    args = parser.parse_args(argv)
+
+    result = measure(args.repeat)
+    print(
+        f"import={result['import_s']:.3f}s construct={result['construct_s'] * 1000:.1f}ms "
+        f"first_run={result['first_run_s']:.3f}s warm_run={result['warm_run_s']:.3f}s "
+        f"heavy_modules={','.join(result['heavy_modules']) or 'none'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
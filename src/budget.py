@@ -0,0 +1,173 @@
+import contextlib
+import contextvars
+import functools
+import inspect
+import time
+from context_budget import tokenize
+
+_deadline = contextvars.ContextVar("storm_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+@contextlib.contextmanager
+def deadline_scope(deadline):
+    """
+    Bound the provider calls made inside the block by ``deadline``, a ``time.time()`` timestamp
+    """
+
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_seconds():
+    """
+    Seconds left before the current deadline, None without one
+    """
+
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+def deadline_node(func, fallback):
+    """
+    Wrap an interview node so its calls stop at the analyst's wall-clock deadline
+
+    Past the deadline, or when one of its calls runs into it, the node
+    returns ``fallback(state)`` instead, so the interview winds down and its
+    section is written from what it has.
+    """
+
+    def past(state):
+        deadline = (state.get("budget") or {}).get("deadline")
+        return deadline, deadline is not None and time.time() >= deadline
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def anode(state):
+            deadline, over = past(state)
+            if over:
+                return fallback(state)
+            with deadline_scope(deadline):
+                try:
+                    return await func(state)
+                except DeadlineExceeded:
+                    return fallback(state)
+        return anode
+
+    @functools.wraps(func)
+    def node(state):
+        deadline, over = past(state)
+        if over:
+            return fallback(state)
+        with deadline_scope(deadline):
+            try:
+                return func(state)
+            except DeadlineExceeded:
+                return fallback(state)
+    return node
+
+
+def novelty(documents, existing):
+    """
+    Share of new information in ``documents`` compared to the ``existing`` context
+
+    A document whose source is already in the context adds nothing, other
+    documents count by the fraction of their distinct terms not yet seen.
+    The result is weighted by document length, 1.0 when there is nothing to
+    compare against.
+    """
+
+    documents = list(documents)
+    if not documents:
+        return 0.0
+
+    seen_sources = {doc["source"] for doc in existing}
+    seen_terms = set()
+    for doc in existing:
+        seen_terms.update(tokenize(doc["content"]))
+
+    new_terms, total_terms = 0, 0
+    for doc in documents:
+        terms = set(tokenize(doc["content"]))
+        total_terms += len(terms)
+        if doc["source"] not in seen_sources:
+            new_terms += len(terms - seen_terms)
+            seen_terms |= terms
+        seen_sources.add(doc["source"])
+    return new_terms / total_terms if total_terms else 0.0
+
+
+class RunBudget:
+    """
+    Token, cost and wall-clock budget for one research run.
+
+    When the interviews fan out, whatever is left of the budget, minus the
+    ``reserve`` kept for reducing the sections and writing the report, is
+    split evenly across the analysts. The wall-clock budget starts at that
+    point, so time spent waiting for analyst approval is not counted. An
+    interview also ends once a turn's retrievals add less than
+    ``min_novelty`` new information to its context. Every limit is optional.
+    """
+
+    def __init__(self, max_tokens=None, max_cost=None, max_seconds=None, min_novelty=0.1, reserve=0.25,
+                 prompt_cost_per_1k=0.00015, completion_cost_per_1k=0.0006):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+        self.min_novelty = min_novelty
+        self.reserve = reserve
+        self.prompt_cost_per_1k = prompt_cost_per_1k
+        self.completion_cost_per_1k = completion_cost_per_1k
+
+    def cost(self, metrics):
+        return (
+            metrics["prompt_tokens"] / 1000 * self.prompt_cost_per_1k
+            + metrics["completion_tokens"] / 1000 * self.completion_cost_per_1k
+        )
+
+    def allocate(self, spent, num_analysts):
+        """
+        Per-analyst allowance given the run's ``spent`` metrics so far
+        """
+
+        share = (1 - self.reserve) / max(1, num_analysts)
+        allowance = {}
+        if self.max_tokens is not None:
+            used = spent["prompt_tokens"] + spent["completion_tokens"]
+            allowance["tokens"] = max(0, self.max_tokens - used) * share
+        if self.max_cost is not None:
+            allowance["cost"] = max(0.0, self.max_cost - self.cost(spent)) * share
+        if self.max_seconds is not None:
+            allowance["deadline"] = time.time() + self.max_seconds * (1 - self.reserve)
+        return allowance
+
+    def exhausted(self, allowance, spent):
+        """
+        Name of the first limit of ``allowance`` that ``spent`` has reached, or None
+        """
+
+        if not allowance:
+            return None
+        if "tokens" in allowance and spent["prompt_tokens"] + spent["completion_tokens"] >= allowance["tokens"]:
+            return "tokens"
+        if "cost" in allowance and self.cost(spent) >= allowance["cost"]:
+            return "cost"
+        if "deadline" in allowance and time.time() >= allowance["deadline"]:
+            return "deadline"
+        return None
+
+    def stale(self, scores):
+        """
+        Whether a turn's retrieval novelty ``scores`` are all below ``min_novelty``
+        """
+
+        return bool(scores) and max(scores) < self.min_novelty
+
+
+UNBOUNDED = RunBudget(min_novelty=0.0)
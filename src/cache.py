@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(payload):
+    """
+    Stable sha256 of any JSON-serializable payload
+    """
+
+    serialized = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.writes = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def record(self, **counts):
+        with self.__lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class SQLiteCacheStore:
+    """
+    Persistent key/value store on a single SQLite file.
+
+    Entries older than ``ttl`` seconds are dropped on read, and the least
+    recently used entries are evicted once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, path, max_entries=None, ttl=None):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.__lock = threading.Lock()
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+        self.__conn = sqlite3.connect(path, check_same_thread=False)
+        self.__conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.__conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self.__lock:
+            row = self.__conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.__ttl is not None and now - created_at > self.__ttl:
+                self.__conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.__conn.commit()
+                return None
+            self.__conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.__conn.commit()
+        return json.loads(value)
+
+    def set(self, key, value):
+        """
+        Store a value and return the number of entries evicted to make room
+        """
+
+        now = time.time()
+        with self.__lock:
+            self.__conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            evicted = self.__evict(now)
+            self.__conn.commit()
+        return evicted
+
+    def __evict(self, now):
+        evicted = 0
+        if self.__ttl is not None:
+            evicted += self.__conn.execute(
+                "DELETE FROM cache WHERE created_at < ?", (now - self.__ttl,)
+            ).rowcount
+        if self.__max_entries is not None:
+            evicted += self.__conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.__max_entries,),
+            ).rowcount
+        return evicted
+
+    def clear(self):
+        with self.__lock:
+            self.__conn.execute("DELETE FROM cache")
+            self.__conn.commit()
+
+    def __len__(self):
+        with self.__lock:
+            return self.__conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class DiskCacheStore:
+    """
+    Persistent key/value store with one JSON file per entry.
+
+    File modification times drive TTL and least recently used eviction.
+    """
+
+    def __init__(self, directory, max_entries=None, ttl=None):
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__lock = threading.Lock()
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+
+    def __path(self, key):
+        return os.path.join(self.__directory, f"{key}.json")
+
+    def get(self, key):
+        path = self.__path(key)
+        with self.__lock:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            if self.__ttl is not None and time.time() - entry["created_at"] > self.__ttl:
+                os.remove(path)
+                return None
+            os.utime(path)
+        return entry["value"]
+
+    def set(self, key, value):
+        path = self.__path(key)
+        with self.__lock:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created_at": time.time(), "value": value}, f)
+            os.replace(tmp_path, path)
+            return self.__evict()
+
+    def __entries(self):
+        entries = []
+        for name in os.listdir(self.__directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.__directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    pass
+        return entries
+
+    def __evict(self):
+        entries = sorted(self.__entries(), reverse=True)
+        expired = []
+        if self.__ttl is not None:
+            cutoff = time.time() - self.__ttl
+            expired = [path for mtime, path in entries if mtime < cutoff]
+        overflow = []
+        if self.__max_entries is not None:
+            overflow = [path for _, path in entries[self.__max_entries:]]
+        stale = set(expired) | set(overflow)
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(stale)
+
+    def clear(self):
+        with self.__lock:
+            for _, path in self.__entries():
+                os.remove(path)
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries())
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of an optional persistent store.
+
+    Values must be JSON-serializable. ``get`` returns ``(found, value)`` so
+    that falsy values can be cached too.
+    """
+
+    def __init__(self, store=None, memory_size=256, ttl=None):
+        self.__store = store
+        self.__memory = OrderedDict()
+        self.__memory_size = memory_size
+        self.__ttl = ttl
+        self.__lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def get(self, key):
+        now = time.time()
+        found, value = self.__from_memory(key, now)
+        if found:
+            return True, value
+        return self.__from_store(key, self.__store.get(key) if self.__store is not None else None, now)
+
+    async def aget(self, key):
+        """
+        ``get`` that reads the persistent store in a worker thread, off the event loop
+        """
+
+        now = time.time()
+        found, value = self.__from_memory(key, now)
+        if found:
+            return True, value
+        value = await asyncio.to_thread(self.__store.get, key) if self.__store is not None else None
+        return self.__from_store(key, value, now)
+
+    def __from_memory(self, key, now):
+        with self.__lock:
+            entry = self.__memory.get(key)
+            if entry is not None and self.__ttl is not None and now - entry[0] > self.__ttl:
+                del self.__memory[key]
+                entry = None
+            if entry is not None:
+                self.__memory.move_to_end(key)
+                self.stats.record(hits=1, memory_hits=1)
+                return True, entry[1]
+        return False, None
+
+    def __from_store(self, key, value, now):
+        if value is None:
+            self.stats.record(misses=1)
+            return False, None
+
+        self.__remember(key, value, now)
+        self.stats.record(hits=1, store_hits=1)
+        return True, value
+
+    def set(self, key, value):
+        self.__remember(key, value, time.time())
+        evicted = self.__store.set(key, value) if self.__store is not None else 0
+        self.stats.record(writes=1, evictions=evicted)
+
+    async def aset(self, key, value):
+        """
+        ``set`` that writes the persistent store in a worker thread, off the event loop
+        """
+
+        self.__remember(key, value, time.time())
+        evicted = await asyncio.to_thread(self.__store.set, key, value) if self.__store is not None else 0
+        self.stats.record(writes=1, evictions=evicted)
+
+    def __remember(self, key, value, now):
+        with self.__lock:
+            self.__memory[key] = (now, value)
+            self.__memory.move_to_end(key)
+            while len(self.__memory) > self.__memory_size:
+                self.__memory.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__memory.clear()
+        if self.__store is not None:
+            self.__store.clear()
+
+
+def cache_dir():
+    """
+    Directory for persistent caches, overridable with STORM_CACHE_DIR
+    """
+
+    return os.environ.get("STORM_CACHE_DIR", ".storm_cache")
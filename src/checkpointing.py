@@ -0,0 +1,134 @@
+import contextlib
+import os
+import sqlite3
+import aiosqlite
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+# Types of this package stored in graph state, allowed back out of checkpoints
+CHECKPOINT_TYPES = [("models.Analyst", "Analyst")]
+
+
+def checkpoint_serde():
+    """
+    Checkpoint serializer that restores this package's state types, also under ``LANGGRAPH_STRICT_MSGPACK``
+    """
+
+    return JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES)
+
+
+def sqlite_checkpointer(path=":memory:"):
+    """
+    SqliteSaver on a file (or in memory) that can be shared across threads
+    """
+
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False), serde=checkpoint_serde())
+
+
+@contextlib.asynccontextmanager
+async def async_sqlite_checkpointer(path=":memory:"):
+    """
+    AsyncSqliteSaver on the same file layout as ``sqlite_checkpointer``
+    """
+
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    async with aiosqlite.connect(path) as conn:
+        yield AsyncSqliteSaver(conn, serde=checkpoint_serde())
+
+
+@contextlib.asynccontextmanager
+async def async_checkpointer(saver=None, path=":memory:"):
+    """
+    Checkpointer for an async run: ``saver`` when given, else an AsyncSqliteSaver on ``path``
+
+    A SqliteSaver implements only the sync interface, so it is rejected
+    rather than silently replaced by a saver the sync methods never read.
+    """
+
+    if saver is None:
+        async with async_sqlite_checkpointer(path) as saver:
+            yield saver
+        return
+    if isinstance(saver, SqliteSaver):
+        raise ValueError(
+            "SqliteSaver does not support async runs; pass checkpoint_path instead of checkpointer, "
+            "or an async-capable checkpointer such as InMemorySaver or AsyncSqliteSaver"
+        )
+    yield saver
+
+
+class CheckpointPruner:
+    """
+    Keeps a SqliteSaver database bounded in size.
+
+    Retains the ``keep_last`` most recent checkpoints of every thread and
+    namespace (the latest one is all that ``resume`` needs) and drops whole
+    threads beyond the ``max_threads`` most recently active ones. Pending
+    writes of deleted checkpoints are removed with them. Pass
+    ``max_threads=None`` to keep every thread.
+    """
+
+    def __init__(self, keep_last=2, max_threads=100, vacuum=False):
+        self.keep_last = keep_last
+        self.max_threads = max_threads
+        self.vacuum = vacuum
+
+    def prune(self, saver):
+        conn = getattr(saver, "conn", None)
+        if not isinstance(conn, sqlite3.Connection):
+            return 0
+
+        lock = getattr(saver, "lock", None) or contextlib.nullcontext()
+        with lock:
+            return self.__prune(conn)
+
+    def prune_path(self, path):
+        """
+        Prune the checkpoint database at ``path`` through a connection of its own
+
+        For databases written by an AsyncSqliteSaver, whose connection is not
+        a ``sqlite3.Connection``.
+        """
+
+        if path == ":memory:" or not os.path.exists(path):
+            return 0
+        conn = sqlite3.connect(path)
+        try:
+            return self.__prune(conn)
+        finally:
+            conn.close()
+
+    def __prune(self, conn):
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not {"checkpoints", "writes"} <= tables:
+            return 0
+
+        deleted = 0
+        if self.max_threads is not None:
+            deleted += conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id NOT IN ("
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id "
+                "ORDER BY MAX(checkpoint_id) DESC LIMIT ?)",
+                (self.max_threads,),
+            ).rowcount
+        if self.keep_last is not None:
+            deleted += conn.execute(
+                "DELETE FROM checkpoints WHERE rowid IN ("
+                "SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER ("
+                "PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS position "
+                "FROM checkpoints) WHERE position > ?)",
+                (self.keep_last,),
+            ).rowcount
+        conn.execute(
+            "DELETE FROM writes WHERE NOT EXISTS ("
+            "SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id "
+            "AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)"
+        )
+        conn.commit()
+        if self.vacuum and deleted:
+            conn.execute("VACUUM")
+        return deleted
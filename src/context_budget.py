@@ -0,0 +1,141 @@
+import logging
+import math
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was what when "
+    "where which who why will with you your".split()
+)
+
+
+def count_tokens(text):
+    """
+    Count tokens with tiktoken when available, otherwise estimate ~4 characters per token
+    """
+
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def tokenize(text):
+    return [term for term in re.findall(r"\w+", text.lower()) if term not in STOPWORDS]
+
+
+def format_document(doc):
+    """
+    Render a retrieved document with the <Document> tag the prompts cite from
+    """
+
+    id = f' id="{doc["id"]}"' if doc.get("id") else ""
+    if doc.get("kind") == "web":
+        return f'<Document{id} href="{doc["source"]}"/>\n{doc["content"]}\n</Document>'
+    return f'<Document{id} source="{doc["source"]}" page="{doc.get("page", "")}"/>\n{doc["content"]}\n</Document>'
+
+
+def chunk_text(text, chunk_tokens, overlap_tokens):
+    """
+    Split text on paragraph boundaries into chunks of roughly chunk_tokens
+    """
+
+    words_per_chunk = max(1, int(chunk_tokens * 0.75))
+    overlap_words = int(overlap_tokens * 0.75)
+
+    chunks, current = [], []
+    for paragraph in re.split(r"\n\s*\n", text):
+        words = paragraph.split()
+        while words:
+            room = words_per_chunk - len(current)
+            current.extend(words[:room])
+            words = words[room:]
+            if len(current) >= words_per_chunk:
+                chunks.append(" ".join(current))
+                current = current[-overlap_words:] if overlap_words else []
+    if current and (not chunks or len(current) > overlap_words):
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class PackedContext:
+    def __init__(self, text, tokens_used, tokens_total, chunks_used, chunks_total):
+        self.text = text
+        self.tokens_used = tokens_used
+        self.tokens_total = tokens_total
+        self.chunks_used = chunks_used
+        self.chunks_total = chunks_total
+
+    @property
+    def tokens_saved(self):
+        return self.tokens_total - self.tokens_used
+
+
+class ContextBudget:
+    """
+    Packs ranked chunks of the retrieved documents into a token budget.
+
+    Documents are dicts with ``source``, ``content`` and optionally ``page``
+    and ``kind``. Chunks come ranked from the run's LocalIndex and are
+    packed greedily; ``stats`` adds up the tokens saved across calls.
+    """
+
+    def __init__(self, max_tokens=2000):
+        self.max_tokens = max_tokens
+        self.__lock = threading.Lock()
+        self.stats = {"calls": 0, "tokens_total": 0, "tokens_used": 0, "tokens_saved": 0}
+
+    def pack_ranked(self, ranked, documents, max_tokens=None, label="context"):
+        """
+        Format already ranked (document, chunk text, tokens) tuples that fit in ``max_tokens``
+
+        ``documents`` is the full context the chunks were selected from. It
+        orders the output and accounts for the tokens saved.
+        """
+
+        budget = max_tokens if max_tokens is not None else self.max_tokens
+        tokens_total = sum(count_tokens(format_document(doc)) for doc in documents)
+
+        selected, tokens_used = [], 0
+        for chunk in ranked:
+            tokens = chunk[2]
+            if tokens_used + tokens > budget:
+                continue
+            selected.append(chunk)
+            tokens_used += tokens
+
+        grouped = {doc["source"]: (doc, []) for doc in documents}
+        for doc, text, _ in selected:
+            grouped.setdefault(doc["source"], (doc, []))[1].append(text)
+        text = "\n\n---\n\n".join(
+            format_document({**doc, "content": "\n\n[...]\n\n".join(texts)})
+            for doc, texts in grouped.values() if texts
+        )
+
+        packed = PackedContext(text, count_tokens(text) if text else 0, tokens_total, len(selected), len(ranked))
+        with self.__lock:
+            self.stats["calls"] += 1
+            self.stats["tokens_total"] += packed.tokens_total
+            self.stats["tokens_used"] += packed.tokens_used
+            self.stats["tokens_saved"] += max(0, packed.tokens_saved)
+        logger.info(
+            "%s: packed %d/%d chunks, %d of %d tokens (saved %d)",
+            label, packed.chunks_used, packed.chunks_total, packed.tokens_used, packed.tokens_total, packed.tokens_saved,
+        )
+        return packed
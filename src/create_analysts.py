@@ -2,9 +2,21 @@ from models.Perspectives import *
 from states import GenerateAnalystsState
 from langgraph.graph import END
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+from llm_cache import CachedChatModel
+from model_registry import ModelRegistry
+from resilience import Resilience
 
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+llm = None
+
+def default_llm():
+    """
+    Model used when no llm is passed in, built on first use
+    """
+
+    global llm
+    if llm is None:
+        llm = CachedChatModel(ModelRegistry().get("analyst_creation"), resilience=Resilience())
+    return llm
 
 analyst_instructions = """
 You are tasked with creating a set of AI analyst personas. Follow these instructions carefully:
@@ -21,27 +33,51 @@ You are tasked with creating a set of AI analyst personas. Follow these instruct
 
 5. Assign one analyst to each theme."""
 
-def create_analysts(state: GenerateAnalystsState):
-    
-    """ 
-    Create analysts 
-    """
-    
+def analyst_messages(state: GenerateAnalystsState, max_analysts=None):
     topic=state['topic']
-    max_analysts=state['max_analysts']
+    max_analysts=max_analysts or state['max_analysts']
     human_analyst_feedback=state.get('human_analyst_feedback', '')
-    
-    structured_llm = llm.with_structured_output(Perspectives)
-    
+
     system_message = analyst_instructions.format(
         topic=topic,
         human_analyst_feedback=human_analyst_feedback,
         max_analysts=max_analysts
     )
+
+    return [SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of analysts.")]
+
+def candidate_count(state: GenerateAnalystsState, selector=None):
+    return selector.candidates(state['max_analysts']) if selector is not None else state['max_analysts']
+
+def selected_analysts(state: GenerateAnalystsState, analysts, selector=None):
+    if selector is None:
+        return {"analysts": analysts}
+    return {"analysts": selector.select(state['topic'], analysts, state['max_analysts'])}
+
+def create_analysts(state: GenerateAnalystsState, llm=None, selector=None):
+    
+    """ 
+    Create analysts 
+
+    With an AnalystSelector, more candidates than needed are generated and
+    a diverse subset of them is kept.
+    """
     
-    analysts = structured_llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of analysts.")])
+    structured_llm = (llm or default_llm()).with_structured_output(Perspectives)
+    analysts = structured_llm.invoke(analyst_messages(state, candidate_count(state, selector)))
     
-    return {"analysts": analysts.analysts}
+    return selected_analysts(state, analysts.analysts, selector)
+
+async def acreate_analysts(state: GenerateAnalystsState, llm=None, selector=None):
+
+    """
+    Create analysts without blocking the event loop
+    """
+
+    structured_llm = (llm or default_llm()).with_structured_output(Perspectives)
+    analysts = await structured_llm.ainvoke(analyst_messages(state, candidate_count(state, selector)))
+
+    return selected_analysts(state, analysts.analysts, selector)
 
 def human_feedback(state: GenerateAnalystsState):
     """ 
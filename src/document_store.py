@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from cache import content_hash
+
+CITATION = re.compile(r"\[((?:[0-9a-f]{8})(?:\s*[,;]\s*[0-9a-f]{8})*)\]")
+
+
+def document_id(doc):
+    """
+    Stable short id of a document, from its source and content
+    """
+
+    return content_hash({"source": doc["source"], "content": doc["content"]})[:8]
+
+
+def source_label(doc):
+    if doc.get("page"):
+        return f"{doc['source']}, page {doc['page']}"
+    return doc["source"]
+
+
+def documents_path(checkpoint_path):
+    """
+    SQLite file for the documents of runs checkpointed to ``checkpoint_path``
+
+    Kept apart from the checkpoints, so that writing documents never waits
+    on a write lock held by the async checkpointer.
+    """
+
+    if not checkpoint_path or checkpoint_path == ":memory:":
+        return checkpoint_path
+    return os.path.splitext(checkpoint_path)[0] + "-documents.sqlite"
+
+
+class DocumentStore:
+    """
+    Run-scoped store of retrieved documents, shared by every interview of a run.
+
+    Documents are stored once per run under an id derived from their source
+    and content. Interview state keeps only the ids. With a ``path`` the
+    documents are also written to SQLite, so a run resumed in a new process
+    still finds them. ``release`` drops a finished run.
+    """
+
+    def __init__(self, path=None):
+        self.__lock = threading.Lock()
+        self.__runs = {}
+        self.__path = path if path and path != ":memory:" else None
+        self.__conn = None
+
+    def __connection(self):
+        # Opened on first use, so constructing a store never touches the disk
+        if self.__path is None:
+            return None
+        if self.__conn is None:
+            directory = os.path.dirname(self.__path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.__path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS storm_documents (thread_id TEXT, id TEXT, document TEXT, PRIMARY KEY (thread_id, id))"
+            )
+            conn.commit()
+            self.__conn = conn
+        return self.__conn
+
+    def __run(self, thread_id):
+        run = self.__runs.get(thread_id)
+        if run is None:
+            run = {}
+            conn = self.__connection()
+            if conn is not None:
+                rows = conn.execute("SELECT id, document FROM storm_documents WHERE thread_id = ?", (thread_id,))
+                run = {id: json.loads(document) for id, document in rows}
+            self.__runs[thread_id] = run
+        return run
+
+    def add(self, thread_id, documents):
+        """
+        Store documents for the run and return their ids, in order
+        """
+
+        ids, new = [], []
+        with self.__lock:
+            run = self.__run(thread_id)
+            for doc in documents:
+                id = document_id(doc)
+                ids.append(id)
+                if id not in run:
+                    run[id] = {**doc, "id": id}
+                    new.append((thread_id, id, json.dumps(run[id])))
+            conn = self.__connection()
+            if new and conn is not None:
+                conn.executemany("INSERT OR IGNORE INTO storm_documents VALUES (?, ?, ?)", new)
+                conn.commit()
+        return ids
+
+    def get(self, thread_id, ids):
+        """
+        Documents for the ids, deduplicated, skipping unknown ids
+        """
+
+        with self.__lock:
+            run = self.__run(thread_id)
+            return [run[id] for id in dict.fromkeys(ids) if id in run]
+
+    def release(self, thread_id):
+        with self.__lock:
+            self.__runs.pop(thread_id, None)
+            conn = self.__connection()
+            if conn is not None:
+                conn.execute("DELETE FROM storm_documents WHERE thread_id = ?", (thread_id,))
+                conn.commit()
+
+    def cite(self, thread_id, texts, numbers=None):
+        """
+        Renumber document-id citations across ``texts`` in order of first use
+
+        Returns the rewritten texts and the Sources lines of the sources they
+        cite. Every source gets one number, however many sections or
+        documents cite it. Unknown ids are dropped from a citation, and a
+        bracket with no known id is left as it is. Pass the
+        same ``numbers`` dict to successive calls to keep numbering sources
+        across them, as a stream of events does.
+        """
+
+        with self.__lock:
+            run = dict(self.__run(thread_id))
+        numbers = numbers if numbers is not None else {}
+        cited = {}
+
+        def renumber(match):
+            found = []
+            for id in re.split(r"\s*[,;]\s*", match.group(1)):
+                if id in run:
+                    source = source_label(run[id])
+                    found.append(numbers.setdefault(source, len(numbers) + 1))
+                    cited[source] = numbers[source]
+            if not found:
+                # Not a citation of this run, such as a date or a hex value in the text
+                return match.group(0)
+            return "".join(f"[{number}]" for number in dict.fromkeys(found))
+
+        texts = [CITATION.sub(renumber, text) for text in texts]
+        sources = [f"[{number}] {source}" for source, number in sorted(cited.items(), key=lambda item: item[1])]
+        return texts, sources
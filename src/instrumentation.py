@@ -0,0 +1,256 @@
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from langchain_core.runnables.config import ensure_config
+from models import CallRecord
+
+_current_analyst = contextvars.ContextVar("storm_current_analyst", default=None)
+
+_current_call = contextvars.ContextVar("storm_current_call", default=None)
+
+METRICS = ("calls", "latency_s", "prompt_tokens", "completion_tokens", "cached_tokens", "retries", "errors", "cache_hits")
+
+
+@contextlib.contextmanager
+def analyst_scope(name):
+    """
+    Attribute the calls made inside the block to an analyst
+    """
+
+    token = _current_analyst.set(name)
+    try:
+        yield
+    finally:
+        _current_analyst.reset(token)
+
+
+def analyst_node(func):
+    """
+    Wrap an interview node so its calls are attributed to ``state["analyst"]``
+    """
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def anode(state):
+            with analyst_scope(state["analyst"].name):
+                return await func(state)
+        return anode
+
+    @functools.wraps(func)
+    def node(state):
+        with analyst_scope(state["analyst"].name):
+            return func(state)
+    return node
+
+
+def note_retry():
+    """
+    Count a retry on the call being profiled, if any
+    """
+
+    call = _current_call.get()
+    if call is not None:
+        call["retries"] += 1
+
+
+def call_context():
+    """
+    Node, analyst and thread id of the graph step making the current call
+    """
+
+    config = ensure_config()
+    node = config.get("metadata", {}).get("langgraph_node")
+    thread_id = config.get("configurable", {}).get("thread_id")
+    return node, _current_analyst.get(), thread_id
+
+
+def usage_of(message):
+    """
+    (prompt, completion, cached) token counts reported on an AIMessage, or None
+    """
+
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return None
+    details = usage.get("input_token_details") or {}
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0), details.get("cache_read", 0) or 0
+
+
+def empty_metrics():
+    return dict.fromkeys(METRICS, 0)
+
+
+def add_record(metrics, record):
+    metrics["calls"] += 1
+    metrics["latency_s"] += record.latency
+    metrics["prompt_tokens"] += record.prompt_tokens
+    metrics["completion_tokens"] += record.completion_tokens
+    metrics["cached_tokens"] += record.cached_tokens
+    metrics["retries"] += record.retries
+    metrics["errors"] += record.error is not None
+    metrics["cache_hits"] += record.cache in ("hit", "coalesced")
+
+
+class RunProfiler:
+    """
+    Collects a CallRecord for every LLM and retriever call and aggregates them per run.
+
+    Records are kept for the ``max_runs`` most recent thread ids and are also
+    passed to every sink's ``write``; ``export`` hands a run's profile to
+    every sink's ``export``.
+    """
+
+    def __init__(self, sinks=(), max_runs=100):
+        self.__sinks = list(sinks)
+        self.__max_runs = max_runs
+        self.__runs = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def call(self, kind, name):
+        """
+        Time the block and record it; the yielded dict takes cache, tokens and retries
+        """
+
+        node, analyst, thread_id = call_context()
+        call = {"cache": "miss", "retries": 0}
+        token = _current_call.set(call)
+        started_at = time.time()
+        started = time.perf_counter()
+        error = None
+        try:
+            yield call
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_call.reset(token)
+            self.add(CallRecord(
+                kind=kind,
+                name=name,
+                node=node,
+                analyst=analyst,
+                thread_id=thread_id,
+                started_at=started_at,
+                latency=time.perf_counter() - started,
+                error=error,
+                **call,
+            ))
+
+    def add(self, record):
+        with self.__lock:
+            records = self.__runs.setdefault(record.thread_id, [])
+            self.__runs.move_to_end(record.thread_id)
+            records.append(record)
+            while len(self.__runs) > self.__max_runs:
+                self.__runs.popitem(last=False)
+        for sink in self.__sinks:
+            sink.write(record)
+
+    def records(self, thread_id):
+        with self.__lock:
+            return list(self.__runs.get(thread_id, []))
+
+    def spent(self, thread_id, analyst=None):
+        """
+        Metrics of a run so far, optionally only for one analyst's calls
+        """
+
+        metrics = empty_metrics()
+        for record in self.records(thread_id):
+            if analyst is None or record.analyst == analyst:
+                add_record(metrics, record)
+        return metrics
+
+    def profile(self, thread_id):
+        """
+        Totals for the run, broken down per node, analyst and dependency
+
+        ``cached_ratio`` is the share of prompt tokens served from the
+        provider's prompt cache.
+        """
+
+        profile = {"thread_id": thread_id, "total": empty_metrics(), "nodes": {}, "analysts": {}, "dependencies": {}}
+        for record in self.records(thread_id):
+            add_record(profile["total"], record)
+            add_record(profile["nodes"].setdefault(record.node or "unknown", empty_metrics()), record)
+            if record.analyst is not None:
+                add_record(profile["analysts"].setdefault(record.analyst, empty_metrics()), record)
+            add_record(profile["dependencies"].setdefault(f"{record.kind}:{record.name}", empty_metrics()), record)
+        for metrics in [profile["total"], *profile["nodes"].values(), *profile["analysts"].values(), *profile["dependencies"].values()]:
+            metrics["cached_ratio"] = metrics["cached_tokens"] / metrics["prompt_tokens"] if metrics["prompt_tokens"] else 0.0
+        return profile
+
+    def export(self, thread_id):
+        profile = self.profile(thread_id)
+        for sink in self.__sinks:
+            sink.export(profile)
+        return profile
+
+
+class _NullProfiler:
+    @contextlib.contextmanager
+    def call(self, kind, name):
+        yield {"cache": "miss", "retries": 0}
+
+    def spent(self, thread_id, analyst=None):
+        return empty_metrics()
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+class JSONLSink:
+    """
+    Appends every call record, and every exported run profile, to a JSONL file
+    """
+
+    def __init__(self, path):
+        self.__path = path
+        self.__lock = threading.Lock()
+
+    def __append(self, line):
+        with self.__lock:
+            with open(self.__path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def write(self, record):
+        self.__append(record.model_dump_json())
+
+    def export(self, profile):
+        self.__append(json.dumps({"profile": profile}))
+
+
+def prometheus_text(profile):
+    """
+    Render a run profile in the Prometheus text exposition format
+    """
+
+    lines = []
+    for metric in METRICS:
+        name = f"storm_{metric}_total" if metric != "latency_s" else "storm_latency_seconds_total"
+        lines.append(f"# TYPE {name} counter")
+        for node, metrics in sorted(profile["nodes"].items()):
+            lines.append(f'{name}{{thread_id="{profile["thread_id"]}",node="{node}"}} {metrics[metric]}')
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusTextSink:
+    """
+    Overwrites a file with the Prometheus text dump of the last exported run
+    """
+
+    def __init__(self, path):
+        self.__path = path
+
+    def write(self, record):
+        pass
+
+    def export(self, profile):
+        with open(self.__path, "w", encoding="utf-8") as f:
+            f.write(prometheus_text(profile))
@@ -1,19 +1,101 @@
 import os
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from langgraph.graph import START, END, StateGraph
-from langgraph.checkpoint.sqlite import SqliteSaver
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.messages import get_buffer_string
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_community.document_loaders import WikipediaLoader
-from models import SearchQuery
-from models import InterviewState
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import ensure_config
+from models import SearchQueries
+from states import InterviewState
+from llm_cache import CachedChatModel
+from model_registry import DEFAULT_MODEL, ModelRegistry
+from retrieval_cache import default_retrieval_cache
+from context_budget import ContextBudget
+from rate_limit import UNLIMITED
+from instrumentation import NULL_PROFILER, analyst_node
+from budget import RunBudget, deadline_node, novelty
+from document_store import DocumentStore
+from local_index import LocalIndex
+from resilience import ProviderError, Resilience
+
+logger = logging.getLogger(__name__)
+
+def default_web_search():
+    """
+    Tavily search tool, imported on first use so langchain_community stays off the import path
+    """
+
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    return TavilySearchResults(max_results=3)
+
+def default_wikipedia_loader(query, load_max_docs=2):
+    from langchain_community.document_loaders import WikipediaLoader
+    return WikipediaLoader(query=query, load_max_docs=load_max_docs)
+
+def web_results(result):
+    """
+    Search results of a web search call, checked for shape
+
+    TavilySearchResults returns a failed request as its error string rather
+    than raising; raising it here lets the call be retried and counted by the
+    circuit breaker. Results without a url or content are dropped.
+    """
+
+    if not isinstance(result, list):
+        raise ProviderError(f"web search returned {type(result).__name__}: {str(result)[:200]}")
+    docs = [doc for doc in result if isinstance(doc, dict) and isinstance(doc.get("url"), str) and isinstance(doc.get("content"), str)]
+    if len(docs) < len(result):
+        logger.warning("Dropped %d malformed web search results", len(result) - len(docs))
+    return docs
+
+
+def wikipedia_results(docs):
+    """
+    Wikipedia documents as cacheable dicts, dropping any without a source
+    """
+
+    results = [
+        {"page_content": doc.page_content, "metadata": doc.metadata}
+        for doc in docs
+        if isinstance(getattr(doc, "page_content", None), str) and isinstance(getattr(doc, "metadata", None), dict) and doc.metadata.get("source")
+    ]
+    if len(results) < len(docs):
+        logger.warning("Dropped %d malformed Wikipedia documents", len(docs) - len(results))
+    return results
 
-class InterviewGraph:
-    def __init__(self):
-        self.__llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-        self.__tavily_search = TavilySearchResults(max_results=3)
 
+class InterviewGraph:
+    def __init__(self, num_queries=1, llm_cache=None, retrieval_cache=None, context_budget=None, section_max_tokens=6000, limiter=None,
+                 chat_model=None, web_search=None, wikipedia_loader=None, profiler=None, budget=None, models=None, documents=None,
+                 index=None, section_top_k=24, resilience=None, summary_turns=None):
+        self.__limiter = limiter if limiter is not None else UNLIMITED
+        self.__profiler = profiler if profiler is not None else NULL_PROFILER
+        self.__resilience = resilience if resilience is not None else Resilience()
+        self.__budget = budget if budget is not None else RunBudget()
+        models = models if models is not None else ModelRegistry(default=chat_model if chat_model is not None else DEFAULT_MODEL)
+        self.__question_llm = CachedChatModel(models.get("question_generation"), llm_cache, self.__limiter, profiler, self.__resilience)
+        self.__query_llm = CachedChatModel(models.get("query_generation"), llm_cache, self.__limiter, profiler, self.__resilience)
+        self.__answer_llm = CachedChatModel(models.get("answering"), llm_cache, self.__limiter, profiler, self.__resilience)
+        self.__section_llm = CachedChatModel(models.get("section_writing"), llm_cache, self.__limiter, profiler, self.__resilience)
+        self.__summary_llm = CachedChatModel(models.get("summarization"), llm_cache, self.__limiter, profiler, self.__resilience)
+        self.__summary_turns = summary_turns
+        self.__tavily_search = web_search if web_search is not None else default_web_search()
+        self.__wikipedia_loader = wikipedia_loader if wikipedia_loader is not None else default_wikipedia_loader
+        self.__retrieval_cache = retrieval_cache if retrieval_cache is not None else default_retrieval_cache()
+        self.__num_queries = num_queries
+        self.__context_budget = context_budget if context_budget is not None else ContextBudget()
+        self.__section_max_tokens = section_max_tokens
+        self.__documents = documents if documents is not None else DocumentStore()
+        self.__index = index if index is not None else LocalIndex()
+        self.__section_top_k = section_top_k
+        self.__compiled = None
+
+        # Prompts are laid out for provider-side prefix caching: static
+        # instructions first, then append-only context such as the analyst
+        # and the conversation, then whatever changes on every call.
         self.__question_instructions = """
         You are an analyst tasked with interviewing an expert to learn about a specific topic. 
 
@@ -23,7 +105,7 @@ class InterviewGraph:
                 
         2. Detailed: Avoid generalities; dig into the expert's code examples, technical specifics, and real-world applications
 
-        Here is your topic of focus and set of goals: {goals}
+        Your topic of focus and set of goals are given at the end of these instructions.
                 
         Begin by introducing yourself using a name that fits your persona, and then ask your question.
 
@@ -34,26 +116,27 @@ class InterviewGraph:
         Remember to stay in character throughout your response, reflecting the persona and goals provided to you."""
 
         self.__search_instructions = SystemMessage(
-            content="""
+            content=f"""
             You will be given a conversation between an analyst and an expert.
 
-            Your goal is to generate a well-structured query for use in retrieval and / or web-search related to the conversation.
+            Your goal is to generate well-structured queries for use in retrieval and / or web-search related to the conversation.
 
             First, analyze the full conversation.
 
             Pay particular attention to the final question posed by the analyst.
 
-            Convert this final question into a well-structred web search query""")
+            Convert this final question into at most {num_queries} well-structred web search queries.
+
+            When asked for more than one query, make each query cover a different aspect of the question.""")
 
         self.__answer_instructions = """
         You are an expert being interview by an analyst.
 
-        Here is analyst area of focus: {goals}.
+        The analyst's area of focus is given at the end of these instructions, and the interview so far follows them.
 
-        Your goal is to answer a question posed by the interviewer.
+        Your goal is to answer the last question posed by the interviewer.
 
-        To answer question, use this context:
-        {context}
+        To answer question, use the context given after the interview.
 
         When answering questions, follow these guidelines:
 
@@ -61,17 +144,11 @@ class InterviewGraph:
 
         2. Do not introduce external information or make assumptions beyond what is explicitly stated in the context.
 
-        3. The context contain sources at the topic of each individual document.
+        3. Each document in the context starts with a <Document> tag carrying its id, for example <Document id="3f9a1c2b" href="..."/>.
 
-        4. Include these sources your answer next to any relevant statements. For example, for source # 1 use [1]. 
+        4. Cite a document by its id in brackets next to any statement it supports, for example [3f9a1c2b].
 
-        5. List your sources in order at the bottom of your answer. [1] Source 1, [2] Source 2, etc
-                
-        6. If the source is: <Document source="assistant/docs/llama3_1.pdf" page="7"/>' then just list: 
-                
-        [1] assistant/docs/llama3_1.pdf, page 7 
-                
-        And skip the addition of the brackets as well as the Document source preamble in your citation."""
+        5. Do not add a list of sources; it is compiled from the citations when the report is assembled."""
 
         self.__section_writer_instructions = """
         You are an expert technical writer. 
@@ -79,7 +156,7 @@ class InterviewGraph:
         Your task is to create a short, easily digestible section of a report based on a set of source documents.
 
         1. Analyze the content of the source documents: 
-        - The name of each source document is at the start of the document, with the <Document tag.
+        - Each source document starts with a <Document tag carrying its id.
                 
         2. Create a report structure using markdown formatting:
         - Use ## for the section title
@@ -88,55 +165,219 @@ class InterviewGraph:
         3. Write the report following this structure:
         a. Title (## header)
         b. Summary (### header)
-        c. Sources (### header)
 
-        4. Make your title engaging based upon the focus area of the analyst: 
-        {focus}
+        4. Make your title engaging based upon the focus area of the analyst, given with the source documents.
 
         5. For the summary section:
         - Set up summary with general background / context related to the focus area of the analyst
         - Emphasize what is novel, interesting, or surprising about insights gathered from the interview
-        - Create a numbered list of source documents, as you use them
         - Do not mention the names of interviewers or experts
         - Aim for approximately 400 words maximum
-        - Use numbered sources in your report (e.g., [1], [2]) based on information from source documents
+        - Cite source documents by their id in brackets (e.g., [3f9a1c2b]) next to the statements they support
                 
-        6. In the Sources section:
-        - Include all sources used in your report
-        - Provide full links to relevant websites or specific document paths
-        - Separate each source by a newline. Use two spaces at the end of each line to create a newline in Markdown.
-        - It will look like:
+        6. Do not add a Sources section; it is compiled from the citations when the report is assembled.
+                
+        7. Final review:
+        - Ensure the report follows the required structure
+        - Include no preamble before the title of the report
+        - Check that all guidelines have been followed"""
 
-        ### Sources
-        [1] Link or Document name
-        [2] Link or Document name
+        self.__summary_instructions = """
+        You keep running notes of an interview between an analyst and an expert.
 
-        7. Be sure to combine sources. For example this is not correct:
+        You will be given the summary so far and the exchanges that followed it.
 
-        [3] https://ai.meta.com/blog/meta-llama-3-1/
-        [4] https://ai.meta.com/blog/meta-llama-3-1/
+        Update the summary with the new exchanges:
 
-        There should be no redundant sources. It should simply be:
+        1. Keep every fact, figure and example the expert gave, with its source ids in brackets (e.g., [3f9a1c2b]).
 
-        [3] https://ai.meta.com/blog/meta-llama-3-1/
-                
-        8. Final review:
-        - Ensure the report follows the required structure
-        - Include no preamble before the title of the report
-        - Check that all guidelines have been followed"""
+        2. Keep the questions already asked, so that they are not asked again.
+
+        3. Reply with the updated summary only."""
+
+        def conversation(state: InterviewState):
+            """
+            The interview so far, with the turns folded into the rolling summary replaced by it
+            """
+
+            summarized = state.get("summarized", 0)
+            if not summarized:
+                return state["messages"]
+            summary = HumanMessage(content=f"Summary of the interview so far:\n{state['summary']}")
+            return [summary] + state["messages"][summarized:]
+
+        def turns_to_fold(state: InterviewState):
+            """
+            Messages that fell out of the last ``summary_turns`` turns and are not summarized yet
+            """
+
+            if not self.__summary_turns:
+                return []
+            # The opening message, then a question and an answer per turn
+            folded = len(state["messages"]) - 2 * self.__summary_turns
+            return state["messages"][state.get("summarized", 0):max(folded, 0)]
+
+        def summary_messages(state: InterviewState, messages):
+            exchanges = f"Summary so far:\n{state.get('summary', '')}\n\nNew exchanges:\n{get_buffer_string(messages)}"
+            return [SystemMessage(content=self.__summary_instructions), HumanMessage(content=exchanges)]
+
+        def folded_summary(state: InterviewState, summary, messages):
+            return {"summary": summary.content, "summarized": state.get("summarized", 0) + len(messages)}
+
+        def summarize(state: InterviewState):
+            messages = turns_to_fold(state)
+            if not messages:
+                return {}
+            return folded_summary(state, self.__summary_llm.invoke(summary_messages(state, messages)), messages)
+
+        async def asummarize(state: InterviewState):
+            messages = turns_to_fold(state)
+            if not messages:
+                return {}
+            return folded_summary(state, await self.__summary_llm.ainvoke(summary_messages(state, messages)), messages)
+
+        def compact(message, name=None):
+            """
+            Keep only the content of a model reply in the state; its usage is already in the profile
+            """
+
+            return AIMessage(content=message.content, name=name or message.name, id=message.id)
+
+        def question_messages(state: InterviewState):
+            # One leading system message, which every chat template accepts; the
+            # shared instructions come first so the provider can cache them
+            goals = f"Here is your topic of focus and set of goals: {state['analyst'].persona}"
+            return [SystemMessage(content=f"{self.__question_instructions}\n\n{goals}")] + conversation(state)
 
         def generate_question(state: InterviewState):
             """
             Node to generate a question
             """
 
-            analyst = state["analyst"]
-            messages = state["messages"]
+            summary = summarize(state)
+            question = self.__question_llm.invoke(question_messages({**state, **summary}))
+
+            return {"messages": [compact(question)], **summary}
+
+        async def agenerate_question(state: InterviewState):
+            summary = await asummarize(state)
+            question = await self.__question_llm.ainvoke(question_messages({**state, **summary}))
+
+            return {"messages": [compact(question)], **summary}
+
+        def distinct_queries(plan):
+            search_queries = []
+            for query in plan.search_queries:
+                query = query.strip()
+                if query and query not in search_queries:
+                    search_queries.append(query)
+
+            return {"search_queries": search_queries[:self.__num_queries]}
+
+        def plan_queries(state: InterviewState):
+
+            """
+            Plan the search queries for this turn, shared by every retriever
+            """
+
+            structured_llm = self.__query_llm.with_structured_output(SearchQueries)
+            plan = structured_llm.invoke([self.__search_instructions]+state['messages'])
+
+            return distinct_queries(plan)
 
-            system_message = self.__question_instructions.format(goals=analyst.persona)
-            question = self.__llm.invoke([SystemMessage(content=system_message)] + messages)
+        async def aplan_queries(state: InterviewState):
+            structured_llm = self.__query_llm.with_structured_output(SearchQueries)
+            plan = await structured_llm.ainvoke([self.__search_instructions]+state['messages'])
 
-            return {"messages": [question]}
+            return distinct_queries(plan)
+
+        def thread_id():
+            return ensure_config().get("configurable", {}).get("thread_id")
+
+        def context_documents(state: InterviewState):
+            """
+            Resolve the document ids in the interview context from the run's document store
+            """
+
+            return self.__documents.get(thread_id(), state.get("context", []))
+
+        # Storing, indexing and ranking documents reads and writes SQLite and
+        # tokenizes, so the async nodes run them off the event loop
+        def store_documents(documents):
+            """
+            Add retrieved documents to the run's document store and local index, returning their ids
+            """
+
+            ids = self.__documents.add(thread_id(), documents)
+            self.__index.add(thread_id(), self.__documents.get(thread_id(), ids))
+            return ids
+
+        def top_chunks(state: InterviewState, query, label, max_tokens=None, k=None):
+            """
+            Pack the chunks of the interview's documents that best match the query
+            """
+
+            documents = context_documents(state)
+            self.__index.add(thread_id(), documents)
+            ranked = self.__index.search(thread_id(), query, doc_ids=[doc["id"] for doc in documents], k=k)
+            return self.__context_budget.pack_ranked(ranked, documents, max_tokens=max_tokens, label=label)
+
+        def turn_novelty(state: InterviewState, documents):
+            """
+            Novelty of this turn's documents over the context gathered in earlier turns
+            """
+
+            turn = len([m for m in state["messages"] if isinstance(m, AIMessage) and m.name == "expert"]) + 1
+            return [{"turn": turn, "score": novelty(documents, context_documents(state))}]
+
+        def retrieve(retriever, search_query, params, load):
+            """
+            Fetch through the retrieval cache with retries, returning no results while the retriever keeps failing
+            """
+
+            try:
+                return self.__retrieval_cache.fetch(
+                    retriever, search_query, params,
+                    lambda: self.__resilience.call(retriever, lambda: load(search_query), kind="search", limiter=self.__limiter),
+                    self.__profiler,
+                )
+            except Exception as e:
+                logger.warning("Skipping %s results for %r: %s: %s", retriever, search_query, type(e).__name__, e)
+                return []
+
+        async def aretrieve(retriever, search_query, params, aload):
+            try:
+                return await self.__retrieval_cache.afetch(
+                    retriever, search_query, params,
+                    lambda: self.__resilience.acall(retriever, lambda: aload(search_query), kind="search", limiter=self.__limiter),
+                    self.__profiler,
+                )
+            except Exception as e:
+                logger.warning("Skipping %s results for %r: %s: %s", retriever, search_query, type(e).__name__, e)
+                return []
+
+        def retrieve_all(retriever, search_queries, params, load):
+            """
+            ``retrieve`` every query in its own thread, returning the results in query order
+            """
+
+            if len(search_queries) <= 1:
+                return [retrieve(retriever, search_query, params, load) for search_query in search_queries]
+            with ThreadPoolExecutor(max_workers=len(search_queries)) as pool:
+                futures = [
+                    pool.submit(contextvars.copy_context().run, retrieve, retriever, search_query, params, load)
+                    for search_query in search_queries
+                ]
+                return [future.result() for future in futures]
+
+        def web_documents(state: InterviewState, results):
+            search_docs = {}
+            for docs in results:
+                for doc in docs:
+                    search_docs.setdefault(doc["url"], {"kind": "web", "source": doc["url"], "content": doc["content"]})
+
+            documents = list(search_docs.values())
+            return {"context": store_documents(documents), "novelty": turn_novelty(state, documents)}
 
         def search_web(state: InterviewState):
             
@@ -144,19 +385,35 @@ class InterviewGraph:
             Retrieve docs from web search
             """
 
-            structured_llm = self.__llm.with_structured_output(SearchQuery)
-            search_query = structured_llm.invoke([self.__search_instructions]+state['messages'])
-            
-            search_docs = self.__tavily_search.invoke(search_query.search_query)
+            def load(search_query):
+                return web_results(self.__tavily_search.invoke(search_query))
 
-            formatted_search_docs = "\n\n---\n\n".join(
-                [
-                    f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
-                    for doc in search_docs
-                ]
-            )
+            return web_documents(state, retrieve_all("tavily", state['search_queries'], {"max_results": 3}, load))
+
+        async def asearch_web(state: InterviewState):
+
+            async def aload(search_query):
+                return web_results(await self.__tavily_search.ainvoke(search_query))
+
+            results = await asyncio.gather(*[
+                aretrieve("tavily", search_query, {"max_results": 3}, aload)
+                for search_query in state['search_queries']
+            ])
+            return await asyncio.to_thread(web_documents, state, results)
 
-            return {"context": [formatted_search_docs]}
+        def wikipedia_documents(state: InterviewState, results):
+            search_docs = {}
+            for docs in results:
+                for doc in docs:
+                    search_docs.setdefault(doc["metadata"]["source"], {
+                        "kind": "wikipedia",
+                        "source": doc["metadata"]["source"],
+                        "page": doc["metadata"].get("page", ""),
+                        "content": doc["page_content"],
+                    })
+
+            documents = list(search_docs.values())
+            return {"context": store_documents(documents), "novelty": turn_novelty(state, documents)}
 
         def search_wikipedia(state: InterviewState):
             
@@ -164,46 +421,50 @@ class InterviewGraph:
             Retrieve docs from wikipedia
             """
 
-            structured_llm = self.__llm.with_structured_output(SearchQuery)
-            search_query = structured_llm.invoke([self.__search_instructions]+state['messages'])
-            
-            search_docs = WikipediaLoader(query=search_query.search_query, 
-                                        load_max_docs=2).load()
+            def load(search_query):
+                return wikipedia_results(self.__wikipedia_loader(query=search_query, load_max_docs=2).load())
 
-            formatted_search_docs = "\n\n---\n\n".join(
-                [
-                    f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
-                    for doc in search_docs
-                ]
-            )
+            return wikipedia_documents(state, retrieve_all("wikipedia", state['search_queries'], {"load_max_docs": 2}, load))
+
+        async def asearch_wikipedia(state: InterviewState):
 
-            return {"context": [formatted_search_docs]}
+            async def aload(search_query):
+                return wikipedia_results(await self.__wikipedia_loader(query=search_query, load_max_docs=2).aload())
+
+            results = await asyncio.gather(*[
+                aretrieve("wikipedia", search_query, {"load_max_docs": 2}, aload)
+                for search_query in state['search_queries']
+            ])
+            return await asyncio.to_thread(wikipedia_documents, state, results)
+
+        def answer_messages(state: InterviewState):
+            messages = state["messages"]
+            context = top_chunks(state, messages[-1].content, "answer_question")
+
+            goals = f"Here is analyst area of focus: {state['analyst'].persona}."
+            context = HumanMessage(content=f"To answer the last question, use this context:\n{context.text}")
+            return [SystemMessage(content=f"{self.__answer_instructions}\n\n{goals}")] + conversation(state) + [context]
 
         def generate_answer(state: InterviewState):
             """
             Node to answer a question
             """
 
-            analyst = state["analyst"]
-            messages = state["messages"]
-            context = state["context"]
+            answer = self.__answer_llm.invoke(answer_messages(state))
 
-            system_message = self.__answer_instructions.format(goals=analyst.persona, context=context)
-            answer = self.__llm.invoke([SystemMessage(system_message)] + messages)
+            return {"messages": [compact(answer, "expert")]}
 
-            answer.name = "expert"
-            
-            return {"messages": [answer]}
+        async def agenerate_answer(state: InterviewState):
+            answer = await self.__answer_llm.ainvoke(await asyncio.to_thread(answer_messages, state))
 
-        def save_interview(state: InterviewState):
+            return {"messages": [compact(answer, "expert")]}
+
+        def route_start(state: InterviewState):
             """
-            Save interviews
+            Go straight to answering when the first question and its retrievals were prefetched
             """
 
-            messages = state["messages"]
-            interview = get_buffer_string(messages)
-
-            return {"interview": interview}
+            return "answer_question" if len(state["messages"]) > 1 else "ask_question"
 
         def route_messages(state: InterviewState, name: str = "expert"):
             """
@@ -218,52 +479,137 @@ class InterviewGraph:
             )
 
             if num_responses >= max_num_turns:
-                return "save_interview"
+                return "write_section"
+
+            analyst = state["analyst"].name
+            if self.__budget.stale([n["score"] for n in state.get("novelty", []) if n["turn"] == num_responses]):
+                logger.info("Ending interview of %s after %d turns: retrieval found little new information", analyst, num_responses)
+                return "write_section"
+
+            limit = self.__budget.exhausted(state.get("budget"), self.__profiler.spent(thread_id(), analyst))
+            if limit is not None:
+                logger.info("Ending interview of %s after %d turns: %s budget reached", analyst, num_responses, limit)
+                return "write_section"
 
             last_question = messages[-2]
 
             if "Thank you so much for your help" in last_question.content:
-                return 'save_interview'
+                return 'write_section'
             return "ask_question"
 
+        def section_messages(state: InterviewState):
+            # The transcript is derived here rather than kept in the state
+            interview = get_buffer_string(state["messages"])
+            analyst = state["analyst"]
+            context = top_chunks(
+                state,
+                analyst.description + "\n" + interview,
+                "write_section",
+                max_tokens=self.__section_max_tokens,
+                k=self.__section_top_k,
+            )
+
+            focus = f"Focus area of the analyst: {analyst.description}"
+            return [SystemMessage(content=self.__section_writer_instructions)]+[HumanMessage(content=f"{focus}\n\nUse this source to write your section: {context.text}")]
+
         def write_section(state: InterviewState):
 
             """ 
             Node to answer a question 
             """
             
-            interview = state["interview"]
-            context = state["context"]
-            analyst = state["analyst"]
-            
-            system_message = self.__section_writer_instructions.format(focus=analyst.description)
-            section = self.__llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Use this source to write your section: {context}")]) 
+            section = self.__section_llm.invoke(section_messages(state))
                         
             return {"sections": [section.content]}
-    
 
-    def build_interview_graph(self):
+        async def awrite_section(state: InterviewState):
+            section = await self.__section_llm.ainvoke(await asyncio.to_thread(section_messages, state))
+
+            return {"sections": [section.content]}
+
+        def skipped(state: InterviewState):
+            return {}
+
+        def no_queries(state: InterviewState):
+            return {"search_queries": []}
+
+        def notes_section(state: InterviewState):
+            """
+            Section of the expert's answers as given, for an interview out of time
+            """
+
+            answers = [m.content for m in state["messages"] if isinstance(m, AIMessage) and m.name == "expert" and m.content]
+            if not answers:
+                return {"sections": []}
+            return {"sections": [f"## {state['analyst'].role}\n\n" + "\n\n".join(answers)]}
+
+        def node(func, afunc, fallback=skipped):
+            return RunnableLambda(analyst_node(deadline_node(func, fallback)), afunc=analyst_node(deadline_node(afunc, fallback)))
+
+        # Past the analyst's deadline every node falls back to doing nothing,
+        # and the section is the expert's answers without a writing call
+        self.__generate_question = node(generate_question, agenerate_question)
+        self.__plan_queries = node(plan_queries, aplan_queries, no_queries)
+        self.__search_web = node(search_web, asearch_web)
+        self.__search_wikipedia = node(search_wikipedia, asearch_wikipedia)
+        self.__generate_answer = node(generate_answer, agenerate_answer)
+        self.__route_messages = route_messages
+        self.__route_start = route_start
+        self.__write_section = node(write_section, awrite_section, notes_section)
+
+    def build_interview_graph(self, checkpointer=None):
         """
         Build the interview graph
+
+        Without a checkpointer the graph shares the checkpointer of the parent
+        graph it is added to, and is compiled only once. Pass one to run the
+        interview graph on its own.
         """
 
+        if checkpointer is None and self.__compiled is not None:
+            return self.__compiled
+
         interview_builder = StateGraph(InterviewState)
         interview_builder.add_node("ask_question", self.__generate_question)
+        interview_builder.add_node("plan_queries", self.__plan_queries)
         interview_builder.add_node("search_web", self.__search_web)
         interview_builder.add_node("search_wikipedia", self.__search_wikipedia)
         interview_builder.add_node("answer_question", self.__generate_answer)
-        interview_builder.add_node("save_interview", self.__save_interview)
         interview_builder.add_node("write_section", self.__write_section)
 
-        interview_builder.add_edge(START, "ask_question")
-        interview_builder.add_edge("ask_question", "search_web")
-        interview_builder.add_edge("ask_question", "search_wikipedia")
+        interview_builder.add_conditional_edges(START, self.__route_start, ["ask_question", "answer_question"])
+        interview_builder.add_edge("ask_question", "plan_queries")
+        interview_builder.add_edge("plan_queries", "search_web")
+        interview_builder.add_edge("plan_queries", "search_wikipedia")
         interview_builder.add_edge("search_web", "answer_question")
         interview_builder.add_edge("search_wikipedia", "answer_question")
-        interview_builder.add_conditional_edges("answer_question", self.__route_messages,['ask_question','save_interview'])
-        interview_builder.add_edge("save_interview", "write_section")
+        interview_builder.add_conditional_edges("answer_question", self.__route_messages,['ask_question','write_section'])
         interview_builder.add_edge("write_section", END)
 
-        memory = SqliteSaver.from_conn_string(":memory:")
+        graph = interview_builder.compile(checkpointer=checkpointer).with_config(run_name="Conduct Interviews")
+        if checkpointer is None:
+            self.__compiled = graph
+        return graph
+
+    def build_prefetch_graph(self):
+        """
+        Build the graph for the first turn of an interview: the question and its retrievals
+
+        Its output, passed as the input of the interview graph, resumes the
+        interview at ``answer_question``.
+        """
+
+        prefetch_builder = StateGraph(InterviewState)
+        prefetch_builder.add_node("ask_question", self.__generate_question)
+        prefetch_builder.add_node("plan_queries", self.__plan_queries)
+        prefetch_builder.add_node("search_web", self.__search_web)
+        prefetch_builder.add_node("search_wikipedia", self.__search_wikipedia)
+
+        prefetch_builder.add_edge(START, "ask_question")
+        prefetch_builder.add_edge("ask_question", "plan_queries")
+        prefetch_builder.add_edge("plan_queries", "search_web")
+        prefetch_builder.add_edge("plan_queries", "search_wikipedia")
+        prefetch_builder.add_edge("search_web", END)
+        prefetch_builder.add_edge("search_wikipedia", END)
 
-        return interview_builder.compile(checkpointer=memory).with_config(run_name="Conduct Interviews")
\ No newline at end of file
+        return prefetch_builder.compile().with_config(run_name="Prefetch Interviews")
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+from langchain_core.messages import convert_to_messages, message_to_dict, messages_from_dict
+from cache import TieredCache, SQLiteCacheStore, cache_dir, content_hash
+from context_budget import count_tokens
+from instrumentation import NULL_PROFILER, usage_of
+from model_registry import model_endpoint
+from rate_limit import UNLIMITED
+from resilience import DIRECT
+
+_default_cache = None
+
+
+def default_llm_cache():
+    """
+    Process-wide LLM cache persisted to SQLite under the cache directory
+    """
+
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TieredCache(
+            store=SQLiteCacheStore(os.path.join(cache_dir(), "llm_cache.sqlite"), max_entries=50_000),
+            memory_size=512,
+        )
+    return _default_cache
+
+
+def normalize_messages(messages):
+    """
+    Reduce messages to role, name and whitespace-normalized content
+    """
+
+    return [
+        {
+            "type": message.type,
+            "name": message.name,
+            "content": " ".join(message.content.split()) if isinstance(message.content, str) else message.content,
+        }
+        for message in convert_to_messages(messages)
+    ]
+
+
+def llm_cache_key(llm, messages, schema=None):
+    """
+    Content address of a call: model, endpoint, parameters, output schema and messages
+    """
+
+    return content_hash({
+        "llm": type(llm).__name__,
+        "base_url": model_endpoint(llm),
+        "params": getattr(llm, "_identifying_params", {}),
+        "schema": schema.model_json_schema() if schema is not None else None,
+        "messages": normalize_messages(messages),
+    })
+
+
+def is_deterministic(llm):
+    # An unset temperature means the provider's default, which samples
+    return getattr(llm, "temperature", None) == 0
+
+
+def model_name(llm):
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+
+def record_usage(call, messages, raw, completion):
+    """
+    Put the token usage of a provider call on the profiler record, estimating it when the provider reports none
+    """
+
+    usage = usage_of(raw)
+    if usage is None:
+        prompt = "\n".join(str(message.content) for message in convert_to_messages(messages))
+        usage = (count_tokens(prompt), count_tokens(completion), 0)
+        call["tokens_estimated"] = True
+    call["prompt_tokens"], call["completion_tokens"], call["cached_tokens"] = usage
+
+
+def unpack_structured(result):
+    """
+    Split an ``include_raw`` structured result into (parsed, raw message)
+    """
+
+    if isinstance(result, dict) and "parsed" in result:
+        if result.get("parsing_error") is not None:
+            raise result["parsing_error"]
+        return result["parsed"], result.get("raw")
+    return result, None
+
+
+class CachedChatModel:
+    """
+    Chat model wrapper that answers repeated calls from a TieredCache.
+
+    Only models with temperature explicitly set to 0 are cached, other calls pass
+    straight through. Calls that reach the provider are throttled by
+    ``limiter``, cache hits are not. Every call is recorded on ``profiler``,
+    provider calls are retried and timed out by ``resilience``.
+    """
+
+    def __init__(self, llm, cache=None, limiter=None, profiler=None, resilience=None):
+        self.__llm = llm
+        self.__cache = cache if cache is not None else default_llm_cache()
+        self.__limiter = limiter if limiter is not None else UNLIMITED
+        self.__profiler = profiler if profiler is not None else NULL_PROFILER
+        self.__resilience = resilience if resilience is not None else DIRECT
+
+    @property
+    def cache(self):
+        return self.__cache
+
+    def invoke(self, messages, **kwargs):
+        with self.__profiler.call("llm", model_name(self.__llm)) as call:
+            key = llm_cache_key(self.__llm, messages) if is_deterministic(self.__llm) else None
+            if key is not None:
+                found, value = self.__cache.get(key)
+                if found:
+                    call["cache"] = "hit"
+                    return messages_from_dict([value])[0]
+            else:
+                call["cache"] = "bypass"
+
+            response = self.__resilience.call(model_name(self.__llm), lambda: self.__llm.invoke(messages, **kwargs), limiter=self.__limiter)
+            record_usage(call, messages, response, str(response.content))
+            if key is not None:
+                self.__cache.set(key, message_to_dict(response))
+            return response
+
+    async def ainvoke(self, messages, **kwargs):
+        with self.__profiler.call("llm", model_name(self.__llm)) as call:
+            key = llm_cache_key(self.__llm, messages) if is_deterministic(self.__llm) else None
+            if key is not None:
+                found, value = await self.__cache.aget(key)
+                if found:
+                    call["cache"] = "hit"
+                    return messages_from_dict([value])[0]
+            else:
+                call["cache"] = "bypass"
+
+            response = await self.__resilience.acall(model_name(self.__llm), lambda: self.__llm.ainvoke(messages, **kwargs), limiter=self.__limiter)
+            record_usage(call, messages, response, str(response.content))
+            if key is not None:
+                await self.__cache.aset(key, message_to_dict(response))
+            return response
+
+    def with_structured_output(self, schema, **kwargs):
+        return CachedStructuredModel(
+            self.__llm,
+            self.__llm.with_structured_output(schema, include_raw=True, **kwargs),
+            schema,
+            self.__cache,
+            self.__limiter,
+            self.__profiler,
+            self.__resilience,
+        )
+
+
+class CachedStructuredModel:
+    def __init__(self, llm, structured_llm, schema, cache, limiter=None, profiler=None, resilience=None):
+        self.__llm = llm
+        self.__structured_llm = structured_llm
+        self.__schema = schema
+        self.__cache = cache
+        self.__limiter = limiter if limiter is not None else UNLIMITED
+        self.__profiler = profiler if profiler is not None else NULL_PROFILER
+        self.__resilience = resilience if resilience is not None else DIRECT
+
+    def invoke(self, messages, **kwargs):
+        with self.__profiler.call("llm", model_name(self.__llm)) as call:
+            key = llm_cache_key(self.__llm, messages, self.__schema) if is_deterministic(self.__llm) else None
+            if key is not None:
+                found, value = self.__cache.get(key)
+                if found:
+                    call["cache"] = "hit"
+                    return self.__schema.model_validate(value)
+            else:
+                call["cache"] = "bypass"
+
+            result = self.__resilience.call(model_name(self.__llm), lambda: self.__structured_llm.invoke(messages, **kwargs), limiter=self.__limiter)
+            response, raw = unpack_structured(result)
+            record_usage(call, messages, raw, response.model_dump_json())
+            if key is not None:
+                self.__cache.set(key, response.model_dump())
+            return response
+
+    async def ainvoke(self, messages, **kwargs):
+        with self.__profiler.call("llm", model_name(self.__llm)) as call:
+            key = llm_cache_key(self.__llm, messages, self.__schema) if is_deterministic(self.__llm) else None
+            if key is not None:
+                found, value = await self.__cache.aget(key)
+                if found:
+                    call["cache"] = "hit"
+                    return self.__schema.model_validate(value)
+            else:
+                call["cache"] = "bypass"
+
+            result = await self.__resilience.acall(model_name(self.__llm), lambda: self.__structured_llm.ainvoke(messages, **kwargs), limiter=self.__limiter)
+            response, raw = unpack_structured(result)
+            record_usage(call, messages, raw, response.model_dump_json())
+            if key is not None:
+                await self.__cache.aset(key, response.model_dump())
+            return response
@@ -0,0 +1,206 @@
+import hashlib
+import math
+import threading
+from collections import Counter
+from context_budget import chunk_text, cosine, count_tokens, tokenize
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ChunkIndex:
+    """
+    Incremental BM25 index over document chunks.
+
+    Documents are chunked once and added to an inverted index, so scoring a
+    query only touches the postings of its terms. With NumPy installed the
+    postings are scored as arrays; with ``embeddings`` (a LangChain
+    Embeddings instance) chunks are ranked by cosine similarity instead,
+    against a normalized embedding matrix.
+    """
+
+    def __init__(self, chunk_tokens=256, chunk_overlap=32, embeddings=None, k1=1.5, b=0.75):
+        self.__chunk_tokens = chunk_tokens
+        self.__chunk_overlap = chunk_overlap
+        self.__embeddings = embeddings
+        self.__k1 = k1
+        self.__b = b
+        self.__lock = threading.Lock()
+        self.__docs = {}
+        self.__chunks = []
+        self.__chunk_docs = []
+        self.__lengths = []
+        self.__postings = {}
+        self.__vectors = []
+        self.__pending = 0
+        self.__arrays = None
+
+    def __len__(self):
+        return len(self.__chunks)
+
+    def add(self, documents):
+        """
+        Chunk and index documents not seen before, returning the number of new chunks
+        """
+
+        new_chunks = []
+        with self.__lock:
+            for doc in documents:
+                if doc["id"] in self.__docs:
+                    continue
+                self.__docs[doc["id"]] = len(self.__docs)
+                # Repeated chunks are dropped within a document only, so a
+                # document sharing text with another one still has chunks
+                seen_chunks = set()
+                for text in chunk_text(doc["content"], self.__chunk_tokens, self.__chunk_overlap):
+                    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                    if digest in seen_chunks:
+                        continue
+                    seen_chunks.add(digest)
+                    position = len(self.__chunks)
+                    self.__chunks.append((doc, text, count_tokens(text)))
+                    self.__chunk_docs.append(self.__docs[doc["id"]])
+                    freqs = Counter(tokenize(text))
+                    self.__lengths.append(sum(freqs.values()))
+                    for term, tf in freqs.items():
+                        self.__postings.setdefault(term, ([], []))
+                        self.__postings[term][0].append(position)
+                        self.__postings[term][1].append(tf)
+                    new_chunks.append(text)
+            if new_chunks:
+                self.__arrays = None
+            if new_chunks and self.__embeddings is not None:
+                # Reserve the vectors' positions, so concurrent adds stay aligned with the chunks
+                start = len(self.__vectors)
+                self.__vectors.extend([None] * len(new_chunks))
+                self.__pending += len(new_chunks)
+
+        if new_chunks and self.__embeddings is not None:
+            vectors = self.__embeddings.embed_documents(new_chunks)
+            with self.__lock:
+                self.__vectors[start:start + len(new_chunks)] = vectors
+                self.__pending -= len(new_chunks)
+                self.__arrays = None
+        return len(new_chunks)
+
+    def __numpy_arrays(self):
+        """
+        NumPy views of the index, rebuilt after every add
+        """
+
+        if self.__arrays is None:
+            lengths = np.asarray(self.__lengths, dtype=np.float64)
+            matrix = None
+            if self.__vectors and not self.__pending:
+                matrix = np.asarray(self.__vectors, dtype=np.float64)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix = matrix / np.where(norms == 0, 1, norms)
+            self.__arrays = {
+                "norm": self.__k1 * (1 - self.__b + self.__b * lengths / (lengths.mean() if len(lengths) else 1)),
+                "docs": np.asarray(self.__chunk_docs, dtype=np.int64),
+                "postings": {},
+                "matrix": matrix,
+            }
+        return self.__arrays
+
+    def __bm25(self, terms):
+        n = len(self.__chunks)
+        idf = {
+            term: math.log(1 + (n - len(self.__postings[term][0]) + 0.5) / (len(self.__postings[term][0]) + 0.5))
+            for term in terms
+        }
+        if np is not None:
+            arrays = self.__numpy_arrays()
+            scores = np.zeros(n)
+            for term in terms:
+                postings = arrays["postings"].get(term)
+                if postings is None:
+                    positions, tfs = self.__postings[term]
+                    postings = arrays["postings"][term] = (np.asarray(positions), np.asarray(tfs, dtype=np.float64))
+                positions, tfs = postings
+                scores[positions] += idf[term] * tfs * (self.__k1 + 1) / (tfs + arrays["norm"][positions])
+            return scores
+
+        avg_length = sum(self.__lengths) / n
+        scores = [0.0] * n
+        for term in terms:
+            for position, tf in zip(*self.__postings[term]):
+                norm = self.__k1 * (1 - self.__b + self.__b * self.__lengths[position] / avg_length)
+                scores[position] += idf[term] * tf * (self.__k1 + 1) / (tf + norm)
+        return scores
+
+    def __similarity(self, query):
+        query_vector = self.__embeddings.embed_query(query)
+        if np is not None:
+            vector = np.asarray(query_vector, dtype=np.float64)
+            return self.__numpy_arrays()["matrix"] @ (vector / (np.linalg.norm(vector) or 1))
+        return [cosine(query_vector, vector) for vector in self.__vectors]
+
+    def search(self, query, k=12, doc_ids=None):
+        """
+        Top ``k`` chunks for the query as (document, chunk text, tokens), best first
+
+        ``doc_ids`` restricts the search to chunks of those documents.
+        """
+
+        with self.__lock:
+            if not self.__chunks:
+                return []
+            if self.__embeddings is not None and not self.__pending:
+                scores = self.__similarity(query)
+            else:
+                scores = self.__bm25([term for term in set(tokenize(query)) if term in self.__postings])
+            allowed = None
+            if doc_ids is not None:
+                allowed = {self.__docs[id] for id in doc_ids if id in self.__docs}
+
+            if np is not None:
+                scores = np.asarray(scores, dtype=np.float64)
+                if allowed is not None:
+                    mask = np.isin(self.__numpy_arrays()["docs"], list(allowed))
+                    scores = np.where(mask, scores, -np.inf)
+                k = min(k, int(np.isfinite(scores).sum()))
+                if k <= 0:
+                    return []
+                threshold = np.partition(-scores, k - 1)[k - 1]
+                candidates = np.flatnonzero(-scores <= threshold)
+                ranked = candidates[np.argsort(-scores[candidates], kind="stable")][:k]
+            else:
+                candidates = range(len(scores))
+                if allowed is not None:
+                    candidates = [i for i in candidates if self.__chunk_docs[i] in allowed]
+                ranked = sorted(candidates, key=lambda i: scores[i], reverse=True)[:k]
+            return [self.__chunks[i] for i in ranked]
+
+
+class LocalIndex:
+    """
+    Run-scoped ChunkIndex per thread id, fed by every retrieval of the run
+    """
+
+    def __init__(self, chunk_tokens=256, chunk_overlap=32, embeddings=None, top_k=12):
+        self.top_k = top_k
+        self.__chunk_tokens = chunk_tokens
+        self.__chunk_overlap = chunk_overlap
+        self.__embeddings = embeddings
+        self.__lock = threading.Lock()
+        self.__runs = {}
+
+    def __run(self, thread_id):
+        with self.__lock:
+            index = self.__runs.get(thread_id)
+            if index is None:
+                index = self.__runs[thread_id] = ChunkIndex(self.__chunk_tokens, self.__chunk_overlap, self.__embeddings)
+            return index
+
+    def add(self, thread_id, documents):
+        return self.__run(thread_id).add(documents)
+
+    def search(self, thread_id, query, doc_ids=None, k=None):
+        return self.__run(thread_id).search(query, k if k is not None else self.top_k, doc_ids)
+
+    def release(self, thread_id):
+        with self.__lock:
+            self.__runs.pop(thread_id, None)
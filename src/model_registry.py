@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import threading
+from resilience import CallTimeoutError, call_with_timeout
+
+logger = logging.getLogger(__name__)
+
+NODE_KEYS = (
+    "analyst_creation",
+    "question_generation",
+    "query_generation",
+    "answering",
+    "section_writing",
+    "summarization",
+    "report_writing",
+)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Below the 120s LLM attempt timeout of the default Resilience policy, so a
+# hung model falls back before the whole chain is given up on and retried
+FALLBACK_TIMEOUT = 30.0
+
+
+def build_chat_model(spec):
+    """
+    Chat model for a spec: a model name, a dict of ChatOpenAI arguments or a ready chat model
+
+    A dict with a ``base_url`` targets any OpenAI-compatible endpoint, for
+    example a local vLLM or Ollama server, and needs no real API key. The
+    client's own retries are off unless the spec sets ``max_retries``; the
+    Resilience layer retries instead.
+    """
+
+    if isinstance(spec, str):
+        spec = {"model": spec}
+    if isinstance(spec, dict):
+        from langchain_openai import ChatOpenAI
+        kwargs = {"temperature": 0, "max_retries": 0, **spec}
+        if kwargs.get("base_url") and "api_key" not in kwargs:
+            kwargs["api_key"] = "not-needed"
+        return ChatOpenAI(**kwargs)
+    return spec
+
+
+def model_label(llm):
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+
+def model_endpoint(llm):
+    """
+    Base URL the model is served from, None for the provider's default
+    """
+
+    return getattr(llm, "openai_api_base", None) or getattr(llm, "base_url", None)
+
+
+class _Fallbacks:
+    def __init__(self, runnables, labels, timeout=None):
+        self.__runnables = runnables
+        self.__labels = labels
+        self.__timeout = timeout
+
+    def __timeout_of(self, i):
+        # The last model has nowhere to fall back to, so it runs until the caller's timeout
+        return self.__timeout if i < len(self.__runnables) - 1 else None
+
+    def invoke(self, messages, **kwargs):
+        for i, runnable in enumerate(self.__runnables):
+            try:
+                return call_with_timeout(lambda runnable=runnable: runnable.invoke(messages, **kwargs), self.__timeout_of(i))
+            except Exception as e:
+                if i == len(self.__runnables) - 1:
+                    raise
+                logger.warning("%s failed (%s: %s), falling back to %s", self.__labels[i], type(e).__name__, e, self.__labels[i + 1])
+
+    async def ainvoke(self, messages, **kwargs):
+        for i, runnable in enumerate(self.__runnables):
+            try:
+                timeout = self.__timeout_of(i)
+                if timeout is None:
+                    return await runnable.ainvoke(messages, **kwargs)
+                try:
+                    return await asyncio.wait_for(runnable.ainvoke(messages, **kwargs), timeout)
+                except asyncio.TimeoutError as e:
+                    raise CallTimeoutError(f"call timed out after {timeout}s") from e
+            except Exception as e:
+                if i == len(self.__runnables) - 1:
+                    raise
+                logger.warning("%s failed (%s: %s), falling back to %s", self.__labels[i], type(e).__name__, e, self.__labels[i + 1])
+
+
+class FallbackChatModel(_Fallbacks):
+    """
+    Tries each chat model in turn until one answers.
+
+    Any exception, including a request timeout configured on the model,
+    moves on to the next model; the last model's error is raised. Every
+    model but the last is also given up on after ``timeout`` seconds, so a
+    hung model falls back too. Caching and determinism follow the first
+    model.
+    """
+
+    def __init__(self, models, timeout=FALLBACK_TIMEOUT):
+        self.__models = list(models)
+        self.__timeout = timeout
+        super().__init__(self.__models, [model_label(model) for model in self.__models], timeout)
+
+    @property
+    def temperature(self):
+        return getattr(self.__models[0], "temperature", None)
+
+    @property
+    def model_name(self):
+        return model_label(self.__models[0])
+
+    @property
+    def _identifying_params(self):
+        return {"fallbacks": [
+            {"params": getattr(model, "_identifying_params", model_label(model)), "base_url": model_endpoint(model)}
+            for model in self.__models
+        ]}
+
+    def with_structured_output(self, schema, **kwargs):
+        return _Fallbacks(
+            [model.with_structured_output(schema, **kwargs) for model in self.__models],
+            [model_label(model) for model in self.__models],
+            self.__timeout,
+        )
+
+
+class ModelRegistry:
+    """
+    Maps each LLM-calling step of the pipeline to a model.
+
+    ``models`` maps keys from NODE_KEYS to a spec or a list of specs, the
+    list being a fallback chain. A spec is a model name, a dict of
+    ChatOpenAI arguments (``base_url`` for local OpenAI-compatible servers,
+    ``timeout``, ...) or a chat model instance. Steps without an entry use
+    ``default``. Models are built on first use and shared between steps with
+    the same spec. In a chain, every model but the last falls back after
+    ``fallback_timeout`` seconds.
+    """
+
+    def __init__(self, models=None, default=DEFAULT_MODEL, fallback_timeout=FALLBACK_TIMEOUT):
+        unknown = set(models or {}) - set(NODE_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown model registry keys: {sorted(unknown)}, expected some of {list(NODE_KEYS)}")
+        self.__models = dict(models or {})
+        self.__default = default
+        self.__fallback_timeout = fallback_timeout
+        self.__built = {}
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def from_json(cls, path):
+        """
+        Load a registry from a JSON file with optional ``default`` and ``models`` keys
+        """
+
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(config.get("models"), config.get("default", DEFAULT_MODEL))
+
+    def __build(self, spec):
+        key = json.dumps(spec, sort_keys=True) if isinstance(spec, (str, dict)) else id(spec)
+        with self.__lock:
+            if key not in self.__built:
+                self.__built[key] = build_chat_model(spec)
+            return self.__built[key]
+
+    def get(self, key):
+        """
+        Chat model for a step, wrapped in a FallbackChatModel when a chain is configured
+        """
+
+        if key not in NODE_KEYS:
+            raise KeyError(key)
+        specs = self.__models.get(key, self.__default)
+        if not isinstance(specs, list):
+            return self.__build(specs)
+        models = [self.__build(spec) for spec in specs]
+        return models[0] if len(models) == 1 else FallbackChatModel(models, self.__fallback_timeout)
@@ -0,0 +1,46 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class CallRecord(BaseModel):
+    kind: str = Field(
+        description="Type of dependency called: llm or retriever."
+    )
+    name: str = Field(
+        description="Model or retriever name."
+    )
+    node: Optional[str] = Field(
+        None, description="Graph node that made the call."
+    )
+    analyst: Optional[str] = Field(
+        None, description="Analyst whose interview made the call."
+    )
+    thread_id: Optional[str] = Field(
+        None, description="Thread id of the run."
+    )
+    started_at: float = Field(
+        description="Unix time the call started."
+    )
+    latency: float = Field(
+        description="Seconds spent in the call, including cache lookups."
+    )
+    cache: str = Field(
+        description="Cache status: hit, miss, coalesced or bypass."
+    )
+    prompt_tokens: int = Field(
+        0, description="Prompt tokens reported by the provider, or estimated."
+    )
+    completion_tokens: int = Field(
+        0, description="Completion tokens reported by the provider, or estimated."
+    )
+    cached_tokens: int = Field(
+        0, description="Prompt tokens served from the provider's prompt cache."
+    )
+    tokens_estimated: bool = Field(
+        False, description="Whether token counts are local estimates."
+    )
+    retries: int = Field(
+        0, description="Retries before the call succeeded or failed."
+    )
+    error: Optional[str] = Field(
+        None, description="Exception raised by the call, if any."
+    )
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+
+class IntroConclusion(BaseModel):
+    introduction: str = Field(
+        description="Report introduction in markdown: a # title, then a ## Introduction section."
+    )
+    conclusion: str = Field(
+        description="Report conclusion in markdown under a ## Conclusion header."
+    )
@@ -0,0 +1,25 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+class ProgressEvent(BaseModel):
+    event: str = Field(
+        description="Kind of event: node, analysts, section, token, report_part or final_report."
+    )
+    node: Optional[str] = Field(
+        None, description="Graph node that produced the event."
+    )
+    analyst: Optional[str] = Field(
+        None, description="Name of the analyst whose interview produced the event."
+    )
+    elapsed: float = Field(
+        description="Seconds since the stream started."
+    )
+    duration: Optional[float] = Field(
+        None, description="Seconds since the previous event of the same interview or of the main graph."
+    )
+    data: Optional[str] = Field(
+        None, description="Section markdown, token text or report content."
+    )
+    sources: List[str] = Field(
+        default_factory=list, description="Sources cited in the data, as numbered throughout the stream."
+    )
@@ -0,0 +1,7 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+class SearchQueries(BaseModel):
+    search_queries: List[str] = Field(
+        description="Distinct search queries for retrieval, most important first."
+    )
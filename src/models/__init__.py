@@ -0,0 +1,7 @@
+from models.Analyst import Analyst
+from models.Perspectives import Perspectives
+from models.SearchQuery import SearchQuery
+from models.SearchQueries import SearchQueries
+from models.ProgressEvent import ProgressEvent
+from models.CallRecord import CallRecord
+from models.IntroConclusion import IntroConclusion
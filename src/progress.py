@@ -0,0 +1,109 @@
+import re
+import time
+from models import ProgressEvent
+
+STREAM_MODES = ["updates", "values", "messages"]
+
+REPORT_NODES = ("write_report", "write_introduction", "write_conclusion", "write_intro_conclusion")
+
+REPORT_KEYS = {
+    "write_report": ("content",),
+    "write_introduction": ("introduction",),
+    "write_conclusion": ("conclusion",),
+    "write_intro_conclusion": ("introduction", "conclusion"),
+}
+
+# A citation that may continue in the next token
+PARTIAL_CITATION = re.compile(r"\[[0-9a-f,;\s]*$")
+
+
+class ProgressTracker:
+    """
+    Turns raw ``(namespace, mode, chunk)`` items from a graph streamed with
+    ``subgraphs=True`` and ``STREAM_MODES`` into ProgressEvents
+
+    Given ``cite``, a callable like ``DocumentStore.cite`` bound to the run's
+    thread id, the document-id citations of sections, tokens and report parts
+    are renumbered as they are emitted, with one number per source for the
+    whole stream, and each event lists the sources it cites. Tokens ending in
+    what may be the start of a citation are held back until it is complete.
+    """
+
+    def __init__(self, cite=None):
+        self.__started = time.perf_counter()
+        self.__last_seen = {}
+        self.__analysts = {}
+        self.__cite = cite
+        self.__numbers = {}
+        self.__held = {}
+
+    def __cited(self, text):
+        if self.__cite is None or not text:
+            return text, []
+        (text,), sources = self.__cite([text], self.__numbers)
+        return text, sources
+
+    def __token(self, node, text):
+        if self.__cite is None:
+            return text
+        text = self.__held.pop(node, "") + text
+        partial = PARTIAL_CITATION.search(text)
+        if partial:
+            self.__held[node] = partial.group()
+            text = text[:partial.start()]
+        return text
+
+    def __event(self, event, namespace, node=None, data=None):
+        now = time.perf_counter()
+        previous = self.__last_seen.get(namespace, self.__started)
+        self.__last_seen[namespace] = now
+        data, sources = self.__cited(data)
+        return ProgressEvent(
+            event=event,
+            node=node,
+            analyst=self.__analysts.get(namespace),
+            elapsed=now - self.__started,
+            duration=now - previous,
+            data=data,
+            sources=sources,
+        )
+
+    def events(self, namespace, mode, chunk):
+        namespace = namespace[:1]
+
+        if mode == "values":
+            analyst = chunk.get("analyst") if isinstance(chunk, dict) else None
+            if namespace and analyst is not None:
+                self.__analysts.setdefault(namespace, analyst.name)
+            return []
+
+        if mode == "messages":
+            message, metadata = chunk
+            node = metadata.get("langgraph_node")
+            if not namespace and node in REPORT_NODES and message.content:
+                text = self.__token(node, message.content)
+                return [self.__event("token", namespace, node, text)] if text else []
+            return []
+
+        events = []
+        for node, update in chunk.items():
+            if node.startswith("__"):
+                continue
+            update = update or {}
+            if node == "create_analysts":
+                names = ", ".join(analyst.name for analyst in update.get("analysts", []))
+                events.append(self.__event("analysts", namespace, node, names))
+            elif node == "write_section" and namespace:
+                for section in update.get("sections", []):
+                    events.append(self.__event("section", namespace, node, section))
+            elif node in REPORT_NODES:
+                held = self.__held.pop(node, "")
+                if held:
+                    events.append(self.__event("token", namespace, node, held))
+                for key in REPORT_KEYS[node]:
+                    events.append(self.__event("report_part", namespace, node, update.get(key)))
+            elif node == "finalize_report":
+                events.append(self.__event("final_report", namespace, node, update.get("final_report")))
+            else:
+                events.append(self.__event("node", namespace, node))
+        return events
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+import weakref
+
+
+class RateLimiter:
+    """
+    Bounds concurrent provider calls and, optionally, their rate.
+
+    Usable as ``with limiter:`` from threads and ``async with limiter:`` from
+    coroutines. ``max_concurrency`` caps calls in flight, ``requests_per_second``
+    enables a token bucket that allows bursts of up to ``burst`` calls.
+    """
+
+    def __init__(self, max_concurrency=8, requests_per_second=None, burst=None):
+        self.__max_concurrency = max_concurrency
+        self.__rate = requests_per_second
+        self.__capacity = burst if burst is not None else max(1, max_concurrency)
+        self.__tokens = float(self.__capacity)
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+        self.__semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.__async_semaphores = weakref.WeakKeyDictionary()
+
+    def __reserve(self):
+        """
+        Take a token from the bucket, returning how long to wait before it is valid
+        """
+
+        if self.__rate is None:
+            return 0.0
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.__capacity, self.__tokens + (now - self.__updated) * self.__rate)
+            self.__updated = now
+            self.__tokens -= 1
+            return 0.0 if self.__tokens >= 0 else -self.__tokens / self.__rate
+
+    def __async_semaphore(self):
+        loop = asyncio.get_running_loop()
+        with self.__lock:
+            semaphore = self.__async_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.__max_concurrency)
+                self.__async_semaphores[loop] = semaphore
+        return semaphore
+
+    def __enter__(self):
+        self.__semaphore.acquire()
+        delay = self.__reserve()
+        if delay:
+            time.sleep(delay)
+        return self
+
+    def __exit__(self, *exc):
+        self.__semaphore.release()
+
+    async def __aenter__(self):
+        await self.__async_semaphore().acquire()
+        delay = self.__reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.__async_semaphore().release()
+
+
+class _Unlimited:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+UNLIMITED = _Unlimited()
@@ -0,0 +1,91 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import HumanMessage, SystemMessage
+from context_budget import count_tokens
+
+memo_summary_instructions = """
+You are a technical editor condensing analyst memos for a report on this overall topic:
+
+{topic}
+
+You will be given several memos. Merge them into a single memo that:
+
+1. Keeps every distinct insight, technical detail and finding; drop only repetition.
+2. Preserves the citations in brackets, for example [3f9a1c2b], next to the statements they support.
+3. Uses markdown with a single ## title and no preamble.
+4. Stays under {max_words} words."""
+
+
+def join_sections(sections):
+    return "\n\n".join([f"{section}" for section in sections])
+
+
+class HierarchicalReducer:
+    """
+    Condenses analyst sections into a tree of summaries.
+
+    Sections are grouped into batches that fit ``batch_max_tokens``, each
+    batch is merged into one memo (batches run in parallel), and the merged
+    memos are reduced again until a level fits the smallest requested budget
+    or a single memo remains. ``levels`` returns every level, the raw
+    sections first.
+    """
+
+    def __init__(self, llm, batch_max_tokens=6000, memo_max_words=500, max_workers=8, max_depth=4):
+        self.__llm = llm
+        self.__batch_max_tokens = batch_max_tokens
+        self.__memo_max_words = memo_max_words
+        self.__max_workers = max_workers
+        self.__max_depth = max_depth
+
+    def batches(self, sections):
+        batches, current, current_tokens = [], [], 0
+        for section in sections:
+            tokens = count_tokens(section)
+            if current and current_tokens + tokens > self.__batch_max_tokens:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(section)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def __messages(self, topic, batch):
+        system_message = memo_summary_instructions.format(topic=topic, max_words=self.__memo_max_words)
+        return [SystemMessage(content=system_message)]+[HumanMessage(content=f"Merge these memos:\n\n{join_sections(batch)}")]
+
+    def __done(self, level, max_tokens, depth):
+        return len(level) <= 1 or count_tokens(join_sections(level)) <= max_tokens or depth >= self.__max_depth
+
+    def levels(self, topic, sections, max_tokens):
+        levels = [list(sections)]
+        while not self.__done(levels[-1], max_tokens, len(levels) - 1):
+            batches = self.batches(levels[-1])
+            with ThreadPoolExecutor(max_workers=self.__max_workers) as pool:
+                futures = [
+                    pool.submit(contextvars.copy_context().run, self.__llm.invoke, self.__messages(topic, batch))
+                    for batch in batches
+                ]
+                levels.append([future.result().content for future in futures])
+        return levels
+
+    async def alevels(self, topic, sections, max_tokens):
+        levels = [list(sections)]
+        while not self.__done(levels[-1], max_tokens, len(levels) - 1):
+            batches = self.batches(levels[-1])
+            memos = await asyncio.gather(*[self.__llm.ainvoke(self.__messages(topic, batch)) for batch in batches])
+            levels.append([memo.content for memo in memos])
+        return levels
+
+
+def first_fitting(levels, max_tokens):
+    """
+    The most detailed level that fits ``max_tokens``, else the most condensed one
+    """
+
+    for level in levels:
+        if count_tokens(join_sections(level)) <= max_tokens:
+            return level
+    return levels[-1]
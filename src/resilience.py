@@ -0,0 +1,351 @@
+import asyncio
+import contextvars
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from budget import DeadlineExceeded, remaining_seconds
+from instrumentation import note_retry
+from rate_limit import UNLIMITED
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+TRANSIENT_NAMES = ("Timeout", "Connection", "RateLimit", "ServiceUnavailable", "InternalServer")
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CallTimeoutError(TimeoutError):
+    pass
+
+
+class ProviderError(RuntimeError):
+    """
+    A failure the provider returned as its result instead of raising
+
+    The HTTP status in the message, if any, decides whether it is retried,
+    like the status of a raised error.
+    """
+
+    def __init__(self, message):
+        super().__init__(message)
+        match = re.search(r"\b([45]\d\d)\b", message)
+        self.status_code = int(match.group(1)) if match else None
+
+
+def status_code(error):
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_transient(error):
+    """
+    Whether a failed call is worth retrying: timeouts, connection errors, rate limits and 5xx responses
+    """
+
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    code = status_code(error)
+    if code is not None:
+        return code in TRANSIENT_STATUS
+    if isinstance(error, OSError):
+        return True
+    if isinstance(error, ProviderError):
+        return any(name in str(error) for name in TRANSIENT_NAMES)
+    return any(name in type(error).__name__ for name in TRANSIENT_NAMES)
+
+
+def retry_after(error):
+    """
+    Seconds the provider asked us to wait, from the Retry-After headers of the error's response
+    """
+
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Retries transient failures with full-jitter exponential backoff.
+
+    A provider's Retry-After hint is honoured when it is longer than the
+    backoff, up to ``max_delay``. Each attempt is cut off after ``timeout``
+    seconds when set.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=30.0, timeout=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+
+    def delay(self, attempt, error):
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hint = retry_after(error)
+        if hint is not None:
+            backoff = max(backoff, hint)
+        return min(self.max_delay, backoff)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency after ``failure_threshold`` consecutive failures.
+
+    After ``reset_timeout`` seconds a single trial call is let through; its
+    success closes the circuit again, its failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__lock = threading.Lock()
+        self.__failures = 0
+        self.__opened_at = None
+        self.__trial = False
+
+    @property
+    def state(self):
+        with self.__lock:
+            if self.__opened_at is None:
+                return "closed"
+            if self.__trial or time.monotonic() - self.__opened_at >= self.__reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self.__lock:
+            if self.__opened_at is None:
+                return True
+            if not self.__trial and time.monotonic() - self.__opened_at >= self.__reset_timeout:
+                self.__trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.__lock:
+            self.__failures = 0
+            self.__opened_at = None
+            self.__trial = False
+
+    def record_failure(self):
+        with self.__lock:
+            self.__failures += 1
+            if self.__trial or self.__failures >= self.__failure_threshold:
+                self.__opened_at = time.monotonic()
+            self.__trial = False
+
+    def record_abandoned(self):
+        """
+        A call that neither succeeded nor failed, such as a cancelled one, frees the trial slot
+        """
+
+        with self.__lock:
+            self.__trial = False
+
+
+def call_with_timeout(func, timeout, limiter=UNLIMITED):
+    """
+    Run ``func`` in a daemon thread and give up waiting after ``timeout`` seconds
+
+    The ``limiter`` slot is taken before the timeout starts, so waiting for
+    it never counts against the call. A hung call is abandoned rather than
+    interrupted, so the caller can move on; it keeps its slot until it
+    actually returns.
+    """
+
+    if timeout is None:
+        with limiter:
+            return func()
+
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        try:
+            future.set_result(context.run(func))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            limiter.__exit__(None, None, None)
+
+    limiter.__enter__()
+    try:
+        threading.Thread(target=run, daemon=True).start()
+    except BaseException:
+        limiter.__exit__(None, None, None)
+        raise
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError as e:
+        if future.done():
+            raise
+        raise CallTimeoutError(f"call timed out after {timeout}s") from e
+
+
+def bounded_timeout(timeout):
+    """
+    The attempt ``timeout`` cut to the time left before the current deadline
+
+    Returns the timeout and whether the deadline set it. Raises
+    DeadlineExceeded when no time is left.
+    """
+
+    left = remaining_seconds()
+    if left is None:
+        return timeout, False
+    if left <= 0:
+        raise DeadlineExceeded("deadline reached")
+    if timeout is None or left < timeout:
+        return left, True
+    return timeout, False
+
+
+DEFAULT_POLICIES = {
+    "llm": RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=60.0, timeout=120.0),
+    "search": RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=10.0, timeout=30.0),
+}
+
+
+class Resilience:
+    """
+    Retries, per-call timeouts and a circuit breaker per dependency.
+
+    ``policies`` overrides the RetryPolicy for a kind of dependency (``llm``
+    or ``search``). Every dependency name, such as a model or a retriever,
+    gets its own CircuitBreaker; calls to an open circuit fail fast with
+    CircuitOpenError. Inside a ``deadline_scope`` no attempt runs past the
+    deadline; reaching it raises DeadlineExceeded, which is not counted as a
+    failure of the dependency.
+    """
+
+    def __init__(self, policies=None, failure_threshold=5, reset_timeout=30.0):
+        self.__policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__breakers = {}
+        self.__lock = threading.Lock()
+
+    def breaker(self, name):
+        with self.__lock:
+            if name not in self.__breakers:
+                self.__breakers[name] = CircuitBreaker(self.__failure_threshold, self.__reset_timeout)
+            return self.__breakers[name]
+
+    def states(self):
+        with self.__lock:
+            breakers = dict(self.__breakers)
+        return {name: breaker.state for name, breaker in breakers.items()}
+
+    def __admit(self, name):
+        breaker = self.breaker(name)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{name} is failing, circuit open")
+        return breaker
+
+    def __retry(self, name, policy, breaker, attempt, error):
+        """
+        Delay before the next attempt, or None when the error should be raised
+        """
+
+        if attempt + 1 >= policy.max_attempts or not is_transient(error):
+            breaker.record_failure()
+            return None
+        delay = policy.delay(attempt, error)
+        left = remaining_seconds()
+        if left is not None:
+            delay = min(delay, max(0.0, left))
+        logger.warning("%s failed (%s: %s), retrying in %.1fs", name, type(error).__name__, error, delay)
+        note_retry()
+        return delay
+
+    def call(self, name, func, kind="llm", limiter=UNLIMITED):
+        """
+        Call ``func`` with retries, holding a ``limiter`` slot during each attempt
+        """
+
+        policy = self.__policies[kind]
+        breaker = self.__admit(name)
+        try:
+            for attempt in range(policy.max_attempts):
+                timeout, by_deadline = bounded_timeout(policy.timeout)
+                try:
+                    result = call_with_timeout(func, timeout, limiter)
+                except Exception as e:
+                    if by_deadline and isinstance(e, CallTimeoutError):
+                        raise DeadlineExceeded("deadline reached during the call") from e
+                    delay = self.__retry(name, policy, breaker, attempt, e)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                else:
+                    breaker.record_success()
+                    return result
+        except BaseException:
+            breaker.record_abandoned()
+            raise
+
+    async def acall(self, name, afunc, kind="llm", limiter=UNLIMITED):
+        policy = self.__policies[kind]
+        breaker = self.__admit(name)
+        try:
+            for attempt in range(policy.max_attempts):
+                timeout, by_deadline = bounded_timeout(policy.timeout)
+                try:
+                    async with limiter:
+                        if timeout is None:
+                            result = await afunc()
+                        else:
+                            try:
+                                result = await asyncio.wait_for(afunc(), timeout)
+                            except asyncio.TimeoutError as e:
+                                raise CallTimeoutError(f"call timed out after {timeout:.1f}s") from e
+                except Exception as e:
+                    if by_deadline and isinstance(e, CallTimeoutError):
+                        raise DeadlineExceeded("deadline reached during the call") from e
+                    delay = self.__retry(name, policy, breaker, attempt, e)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                else:
+                    breaker.record_success()
+                    return result
+        except BaseException:
+            breaker.record_abandoned()
+            raise
+
+
+class _Direct:
+    def call(self, name, func, kind="llm", limiter=UNLIMITED):
+        with limiter:
+            return func()
+
+    async def acall(self, name, afunc, kind="llm", limiter=UNLIMITED):
+        async with limiter:
+            return await afunc()
+
+
+DIRECT = _Direct()
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from cache import TieredCache, SQLiteCacheStore, cache_dir, content_hash
+from instrumentation import NULL_PROFILER
+
+_default_cache = None
+
+
+def default_retrieval_cache():
+    """
+    Process-wide retrieval cache persisted to SQLite, entries expire after a day
+    """
+
+    global _default_cache
+    if _default_cache is None:
+        ttl = 24 * 60 * 60
+        _default_cache = RetrievalCache(
+            TieredCache(
+                store=SQLiteCacheStore(os.path.join(cache_dir(), "retrieval_cache.sqlite"), max_entries=20_000, ttl=ttl),
+                memory_size=256,
+                ttl=ttl,
+            )
+        )
+    return _default_cache
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def non_empty_list(value):
+    return isinstance(value, list) and bool(value)
+
+
+class RetrievalCache:
+    """
+    Memoizes retriever results by normalized query and retriever parameters.
+
+    Concurrent fetches of the same key are coalesced: the first caller runs
+    the fetch, every other caller waits for its result. Only results that
+    pass ``validate`` (by default, a non-empty list) are cached or served
+    from the cache, so an error a retriever returned instead of raising is
+    not replayed until the entry expires.
+    """
+
+    def __init__(self, cache=None, validate=non_empty_list):
+        self.__cache = cache if cache is not None else TieredCache()
+        self.__validate = validate
+        self.__lock = threading.Lock()
+        self.__in_flight = {}
+        self.__async_in_flight = {}
+
+    @property
+    def stats(self):
+        return self.__cache.stats
+
+    def key(self, retriever, query, params):
+        return content_hash({"retriever": retriever, "query": normalize_query(query), "params": params})
+
+    def fetch(self, retriever, query, params, load, profiler=None):
+        """
+        Return cached results for the query or call ``load()`` to fetch them.
+
+        ``load`` must return a JSON-serializable value. The call is recorded
+        on ``profiler``.
+        """
+
+        with (profiler or NULL_PROFILER).call("retriever", retriever) as call:
+            return self.__fetch(retriever, query, params, load, call)
+
+    def __fetch(self, retriever, query, params, load, call):
+        key = self.key(retriever, query, params)
+        found, value = self.__cache.get(key)
+        if found and self.__validate(value):
+            call["cache"] = "hit"
+            return value
+
+        with self.__lock:
+            future = self.__in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.__in_flight[key] = future
+
+        if not owner:
+            self.__cache.stats.record(coalesced=1)
+            call["cache"] = "coalesced"
+            return future.result()
+
+        try:
+            value = load()
+            if self.__validate(value):
+                self.__cache.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.__lock:
+                del self.__in_flight[key]
+
+    async def afetch(self, retriever, query, params, aload, profiler=None):
+        """
+        Async variant of ``fetch``, coalescing concurrent tasks on the running loop
+        """
+
+        with (profiler or NULL_PROFILER).call("retriever", retriever) as call:
+            return await self.__afetch(retriever, query, params, aload, call)
+
+    async def __afetch(self, retriever, query, params, aload, call):
+        key = self.key(retriever, query, params)
+        found, value = await self.__cache.aget(key)
+        if found and self.__validate(value):
+            call["cache"] = "hit"
+            return value
+
+        in_flight_key = (id(asyncio.get_running_loop()), key)
+        future = self.__async_in_flight.get(in_flight_key)
+        if future is not None:
+            self.__cache.stats.record(coalesced=1)
+            call["cache"] = "coalesced"
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.__async_in_flight[in_flight_key] = future
+        try:
+            value = await aload()
+            if self.__validate(value):
+                await self.__cache.aset(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self.__async_in_flight[in_flight_key]
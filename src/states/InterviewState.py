@@ -1,11 +1,15 @@
 import operator
-from typing import Annotated
+from typing import Annotated, List
 from langgraph.graph import MessagesState
 from models.Analyst import *
 
 class InterviewState(MessagesState):
     max_num_turns: int
-    context: Annotated[list, operator.add]
+    search_queries: List[str]
+    context: Annotated[List[str], operator.add]
+    novelty: Annotated[list, operator.add]
+    budget: dict
     analyst: Analyst
-    interview: str
-    sections: str
\ No newline at end of file
+    summary: str
+    summarized: int
+    sections: str
@@ -1,5 +1,5 @@
 import operator
-from typing import List, Annotated
+from typing import List, Annotated, Optional
 from typing_extensions import TypedDict
 from models.Analyst import Analyst
 
@@ -9,7 +9,10 @@ class ResearchGraphState(TypedDict):
     human_analyst_feedback: str 
     analysts: List[Analyst] 
     sections: Annotated[list, operator.add]
+    memos: Optional[List[str]]
+    digest: Optional[List[str]]
     introduction: str 
     content: str 
     conclusion: str
-    final_report: str
\ No newline at end of file
+    final_report: str
+    profile: dict
\ No newline at end of file
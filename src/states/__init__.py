@@ -0,0 +1,3 @@
+from states.GenerateAnalystsState import GenerateAnalystsState
+from states.InterviewState import InterviewState
+from states.ResearchGraphState import ResearchGraphState
@@ -1,21 +1,115 @@
+import asyncio
+import functools
+import logging
+import threading
+import uuid
 from langgraph.graph import START, END, StateGraph
-from langgraph.checkpoint.sqlite import SqliteSaver
 from langgraph.constants import Send
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import ensure_config
 from states import ResearchGraphState
-from langchain_openai import ChatOpenAI
+from models import IntroConclusion
+from llm_cache import CachedChatModel, default_llm_cache
+from model_registry import DEFAULT_MODEL, ModelRegistry
+from retrieval_cache import default_retrieval_cache
+from context_budget import ContextBudget
+from rate_limit import RateLimiter
+from approval import InteractiveApproval
+from progress import ProgressTracker, STREAM_MODES
+from report_reducer import HierarchicalReducer, first_fitting, join_sections
+from checkpointing import CheckpointPruner, async_checkpointer, sqlite_checkpointer
+from instrumentation import RunProfiler
+from budget import RunBudget
+from document_store import DocumentStore, documents_path
+from local_index import LocalIndex
+from resilience import Resilience
 import interview_graph
 import create_analysts
 
-class StormGraph:
-    def __init__(self):
+logger = logging.getLogger(__name__)
 
-        self.__llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+INTRO_CONCLUSION_MODES = ("parallel", "combined", "from_report")
 
-        self.__report_writer_instructions = """
-        You are a technical writer creating a report on this overall topic: 
+class StormGraph:
+    """
+    STORM research graph
+
+    ``intro_conclusion`` selects how the introduction and conclusion are
+    written: ``parallel`` uses two calls over the section digest, ``combined``
+    one structured call over the digest, and ``from_report`` one structured
+    call over the consolidated report once ``write_report`` is done.
+
+    With ``speculative`` the first turn of every proposed analyst's interview
+    (question, queries and retrievals) runs in the background while the
+    analysts await review. Interviews of approved analysts start from that
+    turn; feedback regenerates the analysts for a new topic, so the prefetch
+    is dropped without waiting for it.
+
+    ``checkpointer`` replaces the SQLite checkpointer on ``checkpoint_path``
+    for sync and async runs alike; async runs need a saver with the async
+    interface. Retrieved documents are checkpointed apart, to a file next to
+    ``checkpoint_path``. Without a path they are kept in memory, so to resume
+    a run from a custom checkpointer in a new process, also pass
+    ``documents=DocumentStore(path)``.
+
+    ``analyst_selector``, an AnalystSelector, over-generates analyst
+    personas and keeps a diverse subset of them, so that no two interviews
+    cover the same ground. It is off by default: the model's personas are
+    interviewed as generated, exactly ``max_analysts`` of them.
+    """
+
+    def __init__(self, num_queries=1, llm_cache=None, retrieval_cache=None, context_budget=None, limiter=None, max_concurrency=16,
+                 checkpointer=None, checkpoint_path=None, checkpoint_pruner=None,
+                 report_max_tokens=12000, digest_max_tokens=3000, batch_max_tokens=6000,
+                 max_num_turns=2, chat_model=None, web_search=None, wikipedia_loader=None, profiler=None, budget=None, models=None, documents=None,
+                 intro_conclusion="parallel", index=None, resilience=None, speculative=False, summary_turns=None,
+                 analyst_selector=None):
+
+        self.__llm_cache = llm_cache if llm_cache is not None else default_llm_cache()
+        self.__retrieval_cache = retrieval_cache if retrieval_cache is not None else default_retrieval_cache()
+        self.__context_budget = context_budget if context_budget is not None else ContextBudget()
+        self.__limiter = limiter if limiter is not None else RateLimiter(max_concurrency=8)
+        self.__max_concurrency = max_concurrency
+        self.__graph = None
+        self.__graph_lock = threading.Lock()
+        self.__checkpointer = checkpointer
+        self.__given_checkpointer = checkpointer
+        self.__checkpoint_path = checkpoint_path or ":memory:"
+        self.__checkpoint_pruner = checkpoint_pruner if checkpoint_pruner is not None else CheckpointPruner()
+        models = models if models is not None else ModelRegistry(default=chat_model if chat_model is not None else DEFAULT_MODEL)
+        self.__profiler = profiler if profiler is not None else RunProfiler()
+        self.__resilience = resilience if resilience is not None else Resilience()
+        self.__budget = budget if budget is not None else RunBudget()
+        self.__documents = documents if documents is not None else DocumentStore(documents_path(self.__checkpoint_path))
+        self.__index = index if index is not None else LocalIndex()
+        self.__analyst_selector = analyst_selector
+        self.__max_num_turns = max_num_turns
+        self.__report_max_tokens = report_max_tokens
+        if intro_conclusion not in INTRO_CONCLUSION_MODES:
+            raise ValueError(f"intro_conclusion must be one of {INTRO_CONCLUSION_MODES}, got {intro_conclusion!r}")
+        self.__intro_conclusion = intro_conclusion
+        self.__digest_max_tokens = digest_max_tokens
+        # Models, retrievers and both graphs are built on first use, so
+        # constructing a StormGraph creates no provider clients.
+        self.__models = models
+        self.__batch_max_tokens = batch_max_tokens
+        self.__interview_options = {"num_queries": num_queries, "web_search": web_search, "wikipedia_loader": wikipedia_loader,
+                                     "summary_turns": summary_turns}
+        self.__compiled = None
+        self.__compile_lock = threading.Lock()
+        self.__analyst_llm = None
+        self.__report_llm = None
+        self.__reducer = None
+        self.__interview_graph = None
+        self.__speculative = speculative
+        self.__prefetch_graph = None
+        self.__prefetched = {}
+        self.__prefetching = {}
+        self.__prefetch_lock = threading.Lock()
 
-        {topic}
+        self.__report_writer_instructions = """
+        You are a technical writer creating a report on an overall topic, given with the memos.
             
         You have a team of analysts. Each analyst has done two things: 
 
@@ -36,25 +130,17 @@ class StormGraph:
         3. Use no sub-heading. 
         4. Start your report with a single title header: ## Insights
         5. Do not mention any analyst names in your report.
-        6. Preserve any citations in the memos, which will be annotated in brackets, for example [1] or [2].
-        7. Create a final, consolidated list of sources and add to a Sources section with the `## Sources` header.
-        8. List your sources in order and do not repeat.
-
-        [1] Source 1
-        [2] Source 2
-
-        Here are the memos from your analysts to build your report from: 
-
-        {context}"""
+        6. Preserve any citations in the memos, which will be annotated in brackets, for example [3f9a1c2b].
+        7. Do not add a Sources section; it is compiled from the citations when the report is assembled."""
 
         intro_conclusion_instructions = """
-        You are a technical writer finishing a report on {topic}
+        You are a technical writer finishing a report.
 
-        You will be given all of the sections of the report.
+        You will be given the topic and all of the sections of the report.
 
         You job is to write a crisp and compelling introduction or conclusion section.
 
-        The user will instruct you whether to write the introduction or conclusion.
+        The user will instruct you whether to write the introduction, the conclusion or both.
 
         Include no pre-amble for either section.
 
@@ -66,9 +152,17 @@ class StormGraph:
 
         For your introduction, use ## Introduction as the section header. 
 
-        For your conclusion, use ## Conclusion as the section header.
+        For your conclusion, use ## Conclusion as the section header."""
+
+        def generate_analysts(state: ResearchGraphState):
+            """
+            Create analysts with this graph's cached model
+            """
+
+            return create_analysts.create_analysts(state, llm=self.__analyst_llm, selector=self.__analyst_selector)
 
-        Here are the sections to reflect on for writing: {formatted_str_sections}"""
+        async def agenerate_analysts(state: ResearchGraphState):
+            return await create_analysts.acreate_analysts(state, llm=self.__analyst_llm, selector=self.__analyst_selector)
 
         def initiate_all_interviews(state: ResearchGraphState):
             """
@@ -81,40 +175,123 @@ class StormGraph:
             
             else:
                 topic = state["topic"]
-                return [Send("conduct_interview", {"analyst": analyst,"messages": [HumanMessage(content=f"So you said you were writing an article on {topic}?")]}) for analyst in state["analysts"]]
+                thread_id = ensure_config().get("configurable", {}).get("thread_id")
+                budget = self.__budget.allocate(self.__profiler.spent(thread_id), len(state["analysts"]))
+                prefetched = self.__take_prefetched(thread_id)
+                return [Send("conduct_interview", {**self.__interview_input(analyst, topic), "budget": budget, **prefetched.get((analyst.persona, topic), {})}) for analyst in state["analysts"]]
             
-        def write_report(state: ResearchGraphState):
-            sections = state["sections"]
+        def reduced_sections(levels):
+            """
+            Memos and digest, None where the raw sections fit, which are already in the state
+
+            The levels stop at the report budget, so a digest with a smaller
+            budget may still be too long; ``reduce_digest`` condenses it further.
+            """
+
+            memos = first_fitting(levels, self.__report_max_tokens)
+            digest = first_fitting(levels, self.__digest_max_tokens)
+            return {
+                "memos": memos if memos is not levels[0] else None,
+                "digest": digest if digest is not levels[0] else None,
+            }
+
+        def condensed(state: ResearchGraphState, key):
+            return state[key] if state.get(key) is not None else state["sections"]
+
+        def reduce_sections(state: ResearchGraphState):
+            """
+            Condense the sections until they fit the report budget
+            """
+
+            levels = self.__reducer.levels(state["topic"], state["sections"], self.__report_max_tokens)
+            return reduced_sections(levels)
+
+        async def areduce_sections(state: ResearchGraphState):
+            levels = await self.__reducer.alevels(state["topic"], state["sections"], self.__report_max_tokens)
+            return reduced_sections(levels)
+
+        def reduced_digest(levels):
+            digest = first_fitting(levels, self.__digest_max_tokens)
+            return {"digest": digest} if digest is not levels[0] else {}
+
+        def reduce_digest(state: ResearchGraphState):
+            """
+            Condense the digest further until it fits the intro/conclusion budget, alongside ``write_report``
+            """
+
+            levels = self.__reducer.levels(state["topic"], condensed(state, "digest"), self.__digest_max_tokens)
+            return reduced_digest(levels)
+
+        async def areduce_digest(state: ResearchGraphState):
+            levels = await self.__reducer.alevels(state["topic"], condensed(state, "digest"), self.__digest_max_tokens)
+            return reduced_digest(levels)
+
+        def report_messages(state: ResearchGraphState):
             topic = state["topic"]
 
-            formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
+            formatted_str_sections = join_sections(condensed(state, "memos"))
             
-            system_message = self.__report_writer_instructions.format(topic=topic, context=formatted_str_sections)    
-            report = self.__llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")])
+            memos = f"The overall topic is: {topic}\n\nHere are the memos from your analysts to build your report from:\n\n{formatted_str_sections}"
+            return [SystemMessage(content=self.__report_writer_instructions), HumanMessage(content=memos)]+[HumanMessage(content=f"Write a report based upon these memos.")]
+
+        def write_report(state: ResearchGraphState):
+            report = self.__report_llm.invoke(report_messages(state))
             
             return {"content": report.content}
+
+        async def awrite_report(state: ResearchGraphState):
+            report = await self.__report_llm.ainvoke(report_messages(state))
+
+            return {"content": report.content}
+
+        def intro_conclusion_messages(state: ResearchGraphState, request, source=None):
+            topic = state["topic"]
+
+            formatted_str_sections = source if source is not None else join_sections(condensed(state, "digest"))
+
+            sections = f"The report is on {topic}\n\nHere are the sections to reflect on for writing: {formatted_str_sections}"
+            return [SystemMessage(content=intro_conclusion_instructions), HumanMessage(content=sections)]+[HumanMessage(content=request)]
         
         def write_introduction(state: ResearchGraphState):
-            sections = state["sections"]
-            topic = state["topic"]
+            intro = self.__report_llm.invoke(intro_conclusion_messages(state, "Write the report introduction")) 
 
-            formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
+            return {"introduction": intro.content}
 
-            instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
-            intro = self.__llm.invoke([instructions]+[HumanMessage(content=f"Write the report introduction")]) 
+        async def awrite_introduction(state: ResearchGraphState):
+            intro = await self.__report_llm.ainvoke(intro_conclusion_messages(state, "Write the report introduction"))
 
             return {"introduction": intro.content}
         
-        def write_conclusion(state: ResearchGraphState):
-            sections = state["sections"]
-            topic = state["topic"]
+        def intro_conclusion_request(state: ResearchGraphState):
+            if self.__intro_conclusion == "from_report":
+                return intro_conclusion_messages(state, "Write both the report introduction and conclusion", source=state["content"])
+            return intro_conclusion_messages(state, "Write both the report introduction and conclusion")
 
-            formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
-            
-            instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
-            conclusion = self.__llm.invoke([instructions]+[HumanMessage(content=f"Write the report conclusion")]) 
+        def write_intro_conclusion(state: ResearchGraphState):
+            """
+            Write the introduction and conclusion in a single structured call
+            """
+
+            structured_llm = self.__report_llm.with_structured_output(IntroConclusion)
+            result = structured_llm.invoke(intro_conclusion_request(state))
+
+            return {"introduction": result.introduction, "conclusion": result.conclusion}
+
+        async def awrite_intro_conclusion(state: ResearchGraphState):
+            structured_llm = self.__report_llm.with_structured_output(IntroConclusion)
+            result = await structured_llm.ainvoke(intro_conclusion_request(state))
+
+            return {"introduction": result.introduction, "conclusion": result.conclusion}
+
+        def write_conclusion(state: ResearchGraphState):
+            conclusion = self.__report_llm.invoke(intro_conclusion_messages(state, "Write the report conclusion")) 
             
             return {"conclusion": conclusion.content}
+
+        async def awrite_conclusion(state: ResearchGraphState):
+            conclusion = await self.__report_llm.ainvoke(intro_conclusion_messages(state, "Write the report conclusion"))
+
+            return {"conclusion": conclusion.content}
         
         def finalize_report(state: ResearchGraphState):
             """ 
@@ -124,63 +301,403 @@ class StormGraph:
             content = state["content"]
             if content.startswith("## Insights"):
                 content = content.strip("## Insights")
-            if "## Sources" in content:
-                try:
-                    content, sources = content.split("\n## Sources\n")
-                except:
-                    sources = None
-            else:
-                sources = None
+            content = content.split("\n## Sources\n")[0]
 
-            final_report = state["introduction"] + "\n\n---\n\n" + content + "\n\n---\n\n" + state["conclusion"]
-            if sources is not None:
-                final_report += "\n\n## Sources\n" + sources
-                
-            return {"final_report": final_report}
+            thread_id = ensure_config()["configurable"].get("thread_id")
+            (introduction, content, conclusion), sources = self.__documents.cite(
+                thread_id, [state["introduction"], content, state["conclusion"]]
+            )
+
+            final_report = introduction + "\n\n---\n\n" + content + "\n\n---\n\n" + conclusion
+            if sources:
+                final_report += "\n\n## Sources\n" + "  \n".join(sources)
 
-    def __build_research_graph(self):
+            profile = self.__profiler.export(thread_id)
+                
+            return {"final_report": final_report, "profile": profile}
+
+        self.__create_analysts = RunnableLambda(generate_analysts, afunc=agenerate_analysts)
+        self.__human_feedback = create_analysts.human_feedback
+        self.__initiate_all_interviews = initiate_all_interviews
+        self.__reduce_sections = RunnableLambda(reduce_sections, afunc=areduce_sections)
+        self.__reduce_digest = RunnableLambda(reduce_digest, afunc=areduce_digest)
+        self.__write_report = RunnableLambda(write_report, afunc=awrite_report)
+        self.__write_introduction = RunnableLambda(write_introduction, afunc=awrite_introduction)
+        self.__write_conclusion = RunnableLambda(write_conclusion, afunc=awrite_conclusion)
+        self.__write_intro_conclusion = RunnableLambda(write_intro_conclusion, afunc=awrite_intro_conclusion)
+        self.__finalize_report = finalize_report
+
+    def __build_research_graph(self, checkpointer):
         
         builder = StateGraph(ResearchGraphState)
-        builder.add_node("create_analysts", create_analysts)
+        builder.add_node("create_analysts", self.__create_analysts)
         builder.add_node("human_feedback", self.__human_feedback)
         builder.add_node("conduct_interview", self.__interview_graph)
+        builder.add_node("reduce_sections", self.__reduce_sections)
         builder.add_node("write_report", self.__write_report)
-        builder.add_node("write_introduction", self.__write_introduction)
-        builder.add_node("write_conclusion", self.__write_conclusion)
+        if self.__intro_conclusion != "from_report":
+            builder.add_node("reduce_digest", self.__reduce_digest)
+        if self.__intro_conclusion == "parallel":
+            builder.add_node("write_introduction", self.__write_introduction)
+            builder.add_node("write_conclusion", self.__write_conclusion)
+        else:
+            builder.add_node("write_intro_conclusion", self.__write_intro_conclusion)
         builder.add_node("finalize_report", self.__finalize_report)
 
         builder.add_edge(START, "create_analysts")
         builder.add_edge("create_analysts", "human_feedback")
         builder.add_conditional_edges("human_feedback", self.__initiate_all_interviews, ["create_analysts", "conduct_interview"])
-        builder.add_edge("conduct_interview", "write_report")
-        builder.add_edge("conduct_interview", "write_introduction")
-        builder.add_edge("conduct_interview", "write_conclusion")
-        builder.add_edge(["write_conclusion", "write_report", "write_introduction"], "finalize_report")
+        builder.add_edge("conduct_interview", "reduce_sections")
+        builder.add_edge("reduce_sections", "write_report")
+        if self.__intro_conclusion != "from_report":
+            builder.add_edge("reduce_sections", "reduce_digest")
+        if self.__intro_conclusion == "parallel":
+            builder.add_edge("reduce_digest", "write_introduction")
+            builder.add_edge("reduce_digest", "write_conclusion")
+            builder.add_edge(["write_conclusion", "write_report", "write_introduction"], "finalize_report")
+        elif self.__intro_conclusion == "combined":
+            builder.add_edge("reduce_digest", "write_intro_conclusion")
+            builder.add_edge(["write_report", "write_intro_conclusion"], "finalize_report")
+        else:
+            builder.add_edge("write_report", "write_intro_conclusion")
+            builder.add_edge("write_intro_conclusion", "finalize_report")
         builder.add_edge("finalize_report", END)
 
-        memory = SqliteSaver.from_conn_string(":memory:")
-        return builder.compile(interrupt_before=['human_feedback'], checkpointer=memory)
+        return builder.compile(interrupt_before=['human_feedback'], checkpointer=checkpointer)
+
+    def cache_stats(self):
+        """
+        Hit/miss counters of the caches used by this graph
+        """
+
+        return {
+            "llm": self.__llm_cache.stats.as_dict(),
+            "retrieval": self.__retrieval_cache.stats.as_dict(),
+        }
+
+    def context_stats(self):
+        """
+        Context tokens packed and saved across all interview calls
+        """
+
+        return dict(self.__context_budget.stats)
+
+    def get_profile(self, thread_id):
+        """
+        Tokens, latency, cache hits, retries and errors of a run, per node, analyst and dependency
+        """
+
+        return self.__profiler.profile(thread_id)
+
+    def circuit_states(self):
+        """
+        State of each model and retriever circuit: closed, open or half-open
+        """
+
+        return self.__resilience.states()
+
+    def __compile(self):
+        """
+        Build the models and compile the research and interview graphs once, without a checkpointer
+
+        Every entry point binds its checkpointer to a copy of this graph, so
+        neither sync nor async runs compile anything after the first one.
+        """
+
+        with self.__compile_lock:
+            if self.__compiled is None:
+                models = self.__models
+                self.__analyst_llm = CachedChatModel(models.get("analyst_creation"), self.__llm_cache, self.__limiter, self.__profiler, self.__resilience)
+                self.__report_llm = CachedChatModel(models.get("report_writing"), self.__llm_cache, self.__limiter, self.__profiler, self.__resilience)
+                self.__reducer = HierarchicalReducer(self.__report_llm, batch_max_tokens=self.__batch_max_tokens)
+                interviews = interview_graph.InterviewGraph(
+                    llm_cache=self.__llm_cache,
+                    retrieval_cache=self.__retrieval_cache,
+                    context_budget=self.__context_budget,
+                    limiter=self.__limiter,
+                    models=models,
+                    profiler=self.__profiler,
+                    budget=self.__budget,
+                    documents=self.__documents,
+                    index=self.__index,
+                    resilience=self.__resilience,
+                    **self.__interview_options,
+                )
+                self.__interview_graph = interviews.build_interview_graph()
+                if self.__speculative:
+                    self.__prefetch_graph = interviews.build_prefetch_graph()
+                self.__compiled = self.__build_research_graph(None)
+            return self.__compiled
+
+    def __bind(self, checkpointer):
+        return self.__compile().copy(update={"checkpointer": checkpointer})
+
+    def __get_graph(self):
+        """
+        Research graph bound to this graph's sync checkpointer, reused across invocations
+        """
+
+        with self.__graph_lock:
+            if self.__graph is None:
+                if self.__checkpointer is None:
+                    self.__checkpointer = sqlite_checkpointer(self.__checkpoint_path)
+                self.__graph = self.__bind(self.__checkpointer)
+        return self.__graph
+
+    def __thread_config(self, thread_id, callbacks=None):
+        config = {"configurable": {"thread_id": thread_id}, "max_concurrency": self.__max_concurrency}
+        if callbacks:
+            config["callbacks"] = callbacks
+        return config
+
+    def __run_to_end(self, graph, thread, approval):
+        """
+        Review the analysts if the run waits on human feedback, then finish it
+        """
+
+        state = graph.get_state(thread)
+        if "human_feedback" in state.next:
+            values = state.values
+            prefetch = self.__speculate(values, thread)
+            user_feedback = approval.review(values["topic"], values.get("analysts", []))
+
+            if user_feedback:
+                self.__drop_prefetch(thread["configurable"]["thread_id"])
+                graph.invoke({"topic": values["topic"] + "," + user_feedback, "max_analysts": values["max_analysts"], "human_analyst_feedback": ""}, thread)
+            elif prefetch is not None:
+                prefetch.join()
+            graph.invoke(None, thread)
+            state = graph.get_state(thread)
+
+        self.__release(thread["configurable"]["thread_id"])
+        self.prune_checkpoints()
+        return state.values.get('final_report')
+
+    def __release(self, thread_id):
+        """
+        Drop the run-scoped documents, index and prefetched turns of a finished run
+        """
+
+        self.__documents.release(thread_id)
+        self.__index.release(thread_id)
+        self.__drop_prefetch(thread_id)
+
+    def __interview_input(self, analyst, topic):
+        return {"analyst": analyst, "max_num_turns": self.__max_num_turns, "messages": [HumanMessage(content=f"So you said you were writing an article on {topic}?")]}
+
+    def __take_prefetched(self, thread_id):
+        with self.__prefetch_lock:
+            return self.__prefetched.pop(thread_id, {})
+
+    def __drop_prefetch(self, thread_id):
+        """
+        Forget the prefetch of a run, including one still in flight
+
+        Feedback changes the topic, so no prefetched turn can be used after it.
+        """
+
+        with self.__prefetch_lock:
+            self.__prefetching.pop(thread_id, None)
+            self.__prefetched.pop(thread_id, None)
+
+    def __keep_prefetched(self, thread, token, topic, analysts, results):
+        """
+        Keep the first turn of every analyst whose prefetch succeeded, by persona and topic
+
+        Turns of a prefetch that was dropped while it ran are discarded.
+        """
+
+        turns = {}
+        for analyst, result in zip(analysts, results):
+            if isinstance(result, Exception):
+                logger.warning("Prefetch for %s failed: %s: %s", analyst.name, type(result).__name__, result)
+                continue
+            turns[(analyst.persona, topic)] = {"messages": result["messages"], "context": result.get("context", []), "novelty": result.get("novelty", [])}
+        thread_id = thread["configurable"]["thread_id"]
+        with self.__prefetch_lock:
+            if self.__prefetching.get(thread_id) is not token:
+                return
+            del self.__prefetching[thread_id]
+            self.__prefetched[thread_id] = turns
+
+    def __prefetch(self, values, thread, token):
+        analysts = values.get("analysts", [])
+        try:
+            results = self.__prefetch_graph.batch([self.__interview_input(analyst, values["topic"]) for analyst in analysts], thread, return_exceptions=True)
+        except Exception as e:
+            logger.warning("Prefetch failed: %s: %s", type(e).__name__, e)
+            return
+        self.__keep_prefetched(thread, token, values["topic"], analysts, results)
+
+    async def __aprefetch(self, values, thread, token):
+        analysts = values.get("analysts", [])
+        try:
+            results = await self.__prefetch_graph.abatch([self.__interview_input(analyst, values["topic"]) for analyst in analysts], thread, return_exceptions=True)
+        except Exception as e:
+            logger.warning("Prefetch failed: %s: %s", type(e).__name__, e)
+            return
+        self.__keep_prefetched(thread, token, values["topic"], analysts, results)
+
+    def __speculate(self, values, thread):
+        """
+        Prefetch the first interview turns in a background thread while the analysts are reviewed
+        """
+
+        if not self.__speculative or not values.get("analysts"):
+            return None
+        worker = threading.Thread(target=self.__prefetch, args=(values, thread, self.__start_prefetch(thread)), daemon=True)
+        worker.start()
+        return worker
+
+    def __aspeculate(self, values, thread):
+        if not self.__speculative or not values.get("analysts"):
+            return None
+        return asyncio.create_task(self.__aprefetch(values, thread, self.__start_prefetch(thread)))
+
+    def __start_prefetch(self, thread):
+        token = object()
+        with self.__prefetch_lock:
+            self.__prefetching[thread["configurable"]["thread_id"]] = token
+        return token
+
+    def prune_checkpoints(self):
+        """
+        Apply the pruning policy to the checkpoint database
+        """
+
+        if self.__checkpointer is not None:
+            return self.__checkpoint_pruner.prune(self.__checkpointer)
+        return self.__checkpoint_pruner.prune_path(self.__checkpoint_path)
+
+    def invoke(self, question, max_analysts=3, thread_id=None, approval=None, callbacks=None):
+        """
+        Run the research graph to completion and return the final report
+
+        Every call runs in its own thread unless ``thread_id`` is given. The
+        analysts are reviewed by ``approval`` (interactive by default), which
+        either approves them or returns feedback used to regenerate them once.
+        """
+
+        approval = approval if approval is not None else InteractiveApproval()
+        thread = self.__thread_config(thread_id or str(uuid.uuid4()), callbacks)
+
+        graph = self.__get_graph()
 
-    def invoke(self, question, max_analysts=3):
-        thread = {"configurable": {"thread_id": "1"}}
+        graph.invoke({"topic": question, "max_analysts": max_analysts, "human_analyst_feedback": ""}, thread)
 
-        graph = self.__build_research_graph()
+        return self.__run_to_end(graph, thread, approval)
 
-        graph.invoke({"topic": question, "max_analysts": max_analysts, "human_analyst_feedback": ""}, thread)
+    def resume(self, thread_id, approval=None, callbacks=None):
+        """
+        Continue a run from its last checkpoint and return the final report
 
-        user_approval = input("Are you satisfied with generated analysts (yes/no): ")
+        Work finished before the interruption, such as completed interviews,
+        is restored from the checkpoint rather than executed again. Needs a
+        persistent checkpointer (``checkpoint_path`` or ``checkpointer``) to
+        survive a restart of the process.
+        """
 
-        if user_approval.lower() == "yes":
-            graph.invoke(None, thread)  
-        else:
-            user_feedback = input("How would you improve analyst creation: ")
-            graph.invoke({"topic": question + "," + user_feedback, "max_analysts": max_analysts, "human_analyst_feedback": ""}, thread)
+        approval = approval if approval is not None else InteractiveApproval()
+        thread = self.__thread_config(thread_id, callbacks)
+
+        graph = self.__get_graph()
+        state = graph.get_state(thread)
+        if not state.values:
+            raise ValueError(f"No checkpoint found for thread {thread_id!r}")
+
+        if state.next and "human_feedback" not in state.next:
             graph.invoke(None, thread)
-        
-        final_state = graph.get_state(thread)
-        report = final_state.values.get('final_report')
-        return report
 
-        
+        return self.__run_to_end(graph, thread, approval)
+
+    def stream(self, question, max_analysts=3, thread_id=None, approval=None, callbacks=None):
+        """
+        Run the research graph, yielding ProgressEvents as results arrive
+
+        Each analyst's section is emitted as soon as its interview finishes,
+        followed by the tokens and then the full text of the consolidated
+        report, introduction and conclusion, and finally the assembled report.
+        """
+
+        approval = approval if approval is not None else InteractiveApproval()
+        thread = self.__thread_config(thread_id or str(uuid.uuid4()), callbacks)
+        tracker = ProgressTracker(cite=functools.partial(self.__documents.cite, thread["configurable"]["thread_id"]))
+
+        graph = self.__get_graph()
+
+        for namespace, mode, chunk in graph.stream({"topic": question, "max_analysts": max_analysts, "human_analyst_feedback": ""}, thread, stream_mode=STREAM_MODES, subgraphs=True):
+            yield from tracker.events(namespace, mode, chunk)
+
+        values = graph.get_state(thread).values
+        prefetch = self.__speculate(values, thread)
+        user_feedback = approval.review(question, values.get("analysts", []))
+
+        if user_feedback:
+            self.__drop_prefetch(thread["configurable"]["thread_id"])
+            for namespace, mode, chunk in graph.stream({"topic": question + "," + user_feedback, "max_analysts": max_analysts, "human_analyst_feedback": ""}, thread, stream_mode=STREAM_MODES, subgraphs=True):
+                yield from tracker.events(namespace, mode, chunk)
+        elif prefetch is not None:
+            prefetch.join()
+
+        for namespace, mode, chunk in graph.stream(None, thread, stream_mode=STREAM_MODES, subgraphs=True):
+            yield from tracker.events(namespace, mode, chunk)
+
+        self.__release(thread["configurable"]["thread_id"])
+        self.prune_checkpoints()
+
+    async def ainvoke(self, question, max_analysts=3, thread_id=None, approval=None, callbacks=None):
+        """
+        Run the research graph on the event loop
+
+        Interviews run as concurrent tasks, and provider calls across all of
+        them share this graph's rate limiter.
+        """
+
+        report = None
+        async for event in self.astream(question, max_analysts=max_analysts, thread_id=thread_id, approval=approval, callbacks=callbacks, stream_mode="values"):
+            report = event.get("final_report", report)
+        return report
 
-        
\ No newline at end of file
+    async def astream_progress(self, question, max_analysts=3, thread_id=None, approval=None, callbacks=None):
+        """
+        Async variant of ``stream``
+        """
+
+        thread_id = thread_id or str(uuid.uuid4())
+        tracker = ProgressTracker(cite=functools.partial(self.__documents.cite, thread_id))
+        async for namespace, mode, chunk in self.astream(question, max_analysts=max_analysts, thread_id=thread_id, approval=approval, callbacks=callbacks, stream_mode=STREAM_MODES, subgraphs=True):
+            for event in tracker.events(namespace, mode, chunk):
+                yield event
+
+    async def astream(self, question, max_analysts=3, thread_id=None, approval=None, callbacks=None, stream_mode="updates", subgraphs=False):
+        """
+        Stream graph events of the research run asynchronously
+        """
+
+        approval = approval if approval is not None else InteractiveApproval()
+        thread = self.__thread_config(thread_id or str(uuid.uuid4()), callbacks)
+
+        async with async_checkpointer(self.__given_checkpointer, self.__checkpoint_path) as memory:
+            graph = self.__bind(memory)
+
+            async for event in graph.astream({"topic": question, "max_analysts": max_analysts, "human_analyst_feedback": ""}, thread, stream_mode=stream_mode, subgraphs=subgraphs):
+                yield event
+
+            values = (await graph.aget_state(thread)).values
+            prefetch = self.__aspeculate(values, thread)
+            user_feedback = await asyncio.to_thread(approval.review, question, values.get("analysts", []))
+
+            if user_feedback:
+                self.__drop_prefetch(thread["configurable"]["thread_id"])
+                if prefetch is not None:
+                    prefetch.cancel()
+                async for event in graph.astream({"topic": question + "," + user_feedback, "max_analysts": max_analysts, "human_analyst_feedback": ""}, thread, stream_mode=stream_mode, subgraphs=subgraphs):
+                    yield event
+            elif prefetch is not None:
+                await prefetch
+
+            async for event in graph.astream(None, thread, stream_mode=stream_mode, subgraphs=subgraphs):
+                yield event
+
+        self.__release(thread["configurable"]["thread_id"])
+        await asyncio.to_thread(self.prune_checkpoints)